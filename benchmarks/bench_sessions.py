@@ -0,0 +1,117 @@
+"""Memory and parse cost of the in-memory session representations.
+
+Compares the original layouts (`time_logs` dicts of ISO strings, lists of
+`Session` tuples) with packed `SessionLog` buffers on the same synthetic
+history:
+
+    python -m benchmarks.bench_sessions --staff 500 --sessions 2000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from core.models import Session, SessionLog
+from core.storage import to_iso, to_timestamp
+
+
+def synthetic_sessions(staff: int, sessions: int, seed: int) -> Dict[int, list]:
+    rng = random.Random(seed)
+    now = int(time.time())
+    history = {}
+    for user_id in range(staff):
+        starts = sorted(rng.randrange(now - 365 * 86400, now) for _ in range(sessions))
+        rows = []
+        for start in starts:
+            duration = rng.randrange(10 * 60, 4 * 3600)
+            rows.append(Session(start, start + duration, float(duration)))
+        history[user_id] = rows
+    return history
+
+
+def iso_document(history: Dict[int, list]) -> str:
+    return json.dumps({
+        str(user_id): [{"start": to_iso(s.start), "end": to_iso(s.end), "duration_seconds": s.duration} for s in rows]
+        for user_id, rows in history.items()
+    })
+
+
+def rows_document(history: Dict[int, list]) -> str:
+    return json.dumps({str(user_id): [list(session) for session in rows] for user_id, rows in history.items()})
+
+
+def packed_document(history: Dict[int, list]) -> str:
+    return json.dumps({str(user_id): SessionLog.from_sessions(rows).to_text() for user_id, rows in history.items()})
+
+
+def load_iso(text: str):
+    return json.loads(text)
+
+
+def load_rows(text: str):
+    return {int(user_id): [Session(*row) for row in rows] for user_id, rows in json.loads(text).items()}
+
+
+def load_packed(text: str):
+    return {int(user_id): SessionLog.from_text(log) for user_id, log in json.loads(text).items()}
+
+
+def scan_iso(state) -> float:
+    # What the JSON backend did for every history scan: parse both timestamps of each entry.
+    return sum(to_timestamp(log["end"]) - to_timestamp(log["start"]) for logs in state.values() for log in logs)
+
+
+def scan_sessions(state) -> float:
+    return sum(session.end - session.start for sessions in state.values() for session in sessions)
+
+
+def measure(load: Callable, scan: Callable, text: str, count: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    state = load(text)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del state
+
+    started = time.perf_counter()
+    state = load(text)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    scan(state)
+    scan_seconds = time.perf_counter() - started
+    return {
+        "document_mb": len(text) / 2 ** 20,
+        "bytes_per_session": retained / count,
+        "load_us_per_session": load_seconds / count * 1e6,
+        "scan_us_per_session": scan_seconds / count * 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory and parse cost of session representations.")
+    parser.add_argument("--staff", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=2000, help="Closed sessions per staff member.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    history = synthetic_sessions(args.staff, args.sessions, args.seed)
+    count = args.staff * args.sessions
+    results = {
+        "iso dicts (time_logs)": measure(load_iso, scan_iso, iso_document(history), count),
+        "Session tuples": measure(load_rows, scan_sessions, rows_document(history), count),
+        "SessionLog (packed)": measure(load_packed, scan_sessions, packed_document(history), count),
+    }
+    print(f"{count} sessions ({args.staff} staff x {args.sessions})")
+    header = f"{'representation':<24}{'document MB':>13}{'bytes/session':>15}{'load µs/session':>17}{'scan µs/session':>17}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['document_mb']:>13.1f}{stats['bytes_per_session']:>15.1f}"
+              f"{stats['load_us_per_session']:>17.3f}{stats['scan_us_per_session']:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Offline load test for the timeclock cog.
+
+Drives the real `ActivityCog` against a temporary store filled with synthetic
+history and stub Discord objects, so nothing touches the network:
+
+    python -m benchmarks.bench_timeclock --staff 200 --sessions 500 --backend sqlite
+    python -m benchmarks.bench_timeclock --json baseline.json
+    python -m benchmarks.bench_timeclock --baseline baseline.json --tracemalloc
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeBot, FakeGuild, FakeInteraction, FakeMember, FakeRole, FakeTextChannel
+from cogs import timeclock
+from core.storage import to_iso
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+GUILD_ID = 1342569119000000000
+FIRST_USER_ID = 100000000000000000
+
+
+def synthetic_document(staff: int, sessions: int, days: int, open_ratio: float, seed: int) -> dict:
+    """Builds a legacy `activity_data.json` document, which every backend imports on first start."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    time_logs = {}
+    clocked_in = {}
+    for index in range(staff):
+        user_id = FIRST_USER_ID + index
+        starts = sorted(rng.randrange(now - days * 86400, now - 4 * 3600) for _ in range(sessions))
+        logs = []
+        for start in starts:
+            duration = rng.randrange(10 * 60, 4 * 3600)
+            logs.append({"start": to_iso(start), "end": to_iso(start + duration), "duration_seconds": float(duration)})
+        time_logs[str(user_id)] = logs
+        if rng.random() < open_ratio:
+            clocked_in[str(user_id)] = to_iso(now - rng.randrange(60, 3600))
+    return {"currently_clocked_in": clocked_in, "time_logs": time_logs, "last_quota_notification": {}, "afk_check_sent": {}}
+
+
+def build_guild(staff: int, blocked_ratio: float, dm_latency: float, seed: int) -> FakeGuild:
+    rng = random.Random(seed)
+    guild = FakeGuild(GUILD_ID)
+    roles = [FakeRole(role_id, info["name"]) for role_id, info in timeclock.ROLE_GOALS.items()]
+    for role in roles:
+        guild.add_role(role)
+    for index in range(staff):
+        member_roles = [roles[index % len(roles)]]
+        if index % 7 == 0:
+            member_roles.append(roles[(index + 1) % len(roles)])
+        guild.add_member(FakeMember(FIRST_USER_ID + index, guild, member_roles, dms_open=rng.random() >= blocked_ratio, dm_latency=dm_latency))
+    return guild
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    async def time(self, name: str, coro):
+        started = time.perf_counter()
+        result = await coro
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "count": len(samples),
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "max_ms": max(samples) * 1000,
+            }
+            for name, samples in self.samples.items()
+        }
+
+
+async def run_benchmark(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="timeclock-bench-")
+    timeclock.STORAGE_BACKEND = args.backend
+    timeclock.DATABASE_FILE = os.path.join(workdir, "activity_data.db")
+    timeclock.SNAPSHOT_FILE = os.path.join(workdir, "activity_snapshot.json")
+    timeclock.DATA_FILE = os.path.join(workdir, "activity_data.json")
+    # Every quota tick should do a full pass instead of hitting the per-member cooldown.
+    timeclock.NOTIFICATION_COOLDOWN_HOURS = 0
+
+    document = synthetic_document(args.staff, args.sessions, args.days, args.open_ratio, args.seed)
+    with open(timeclock.DATA_FILE, "w") as f:
+        json.dump(document, f)
+    del document
+
+    guild = build_guild(args.staff, args.blocked_ratio, args.dm_latency, args.seed)
+    log_channel = FakeTextChannel(timeclock.LOG_CHANNEL_ID, guild)
+    guild.add_channel(log_channel)
+    bot = FakeBot([guild])
+    members = guild.members
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    cog = timeclock.ActivityCog(bot)
+    await recorder.time("cog_load", cog.cog_load())
+    # Ticks are driven by hand below; the real loops would start firing on their own.
+    cog.check_staff_quotas.cancel()
+    cog.maintain_storage.cancel()
+    cog.archive_old_sessions.cancel()
+    cog.afk_scheduler.stop()
+    cog.afk_response_scheduler.stop()
+    state = await cog.open_guild(guild)
+
+    panel = timeclock.ActivityPanelView(cog)
+    clocked_in = set(await state.storage.get_open_sessions())
+    for _ in range(args.iterations):
+        member = rng.choice(members)
+        if member.id in clocked_in:
+            await recorder.time("button:clock_out", panel.clock_out.callback(FakeInteraction(member, log_channel)))
+            clocked_in.discard(member.id)
+        await recorder.time("button:clock_in", panel.clock_in.callback(FakeInteraction(member, log_channel)))
+        await recorder.time("button:clock_out", panel.clock_out.callback(FakeInteraction(member, log_channel)))
+        await recorder.time("button:my_info", panel.my_info.callback(FakeInteraction(rng.choice(members), log_channel)))
+        await recorder.time("button:top_staff", panel.top_3_staff.callback(FakeInteraction(rng.choice(members), log_channel)))
+
+    week = timeclock.app_commands.Choice(name="This week", value="week")
+    role = guild.get_role(next(iter(timeclock.ROLE_GOALS)))
+    for _ in range(args.iterations):
+        admin = rng.choice(members)
+        await recorder.time("command:viewactivity", cog.view_activity.callback(cog, FakeInteraction(admin, log_channel), rng.choice(members)))
+        await recorder.time("command:leaderboard", cog.show_leaderboard.callback(cog, FakeInteraction(admin, log_channel)))
+        await recorder.time("command:leaderboard_week_role", cog.show_leaderboard.callback(cog, FakeInteraction(admin, log_channel), week, role))
+
+    for _ in range(args.ticks):
+        await recorder.time("loop:check_staff_quotas", cog.check_staff_quotas())
+        await recorder.time("loop:maintain_storage", cog.maintain_storage())
+
+        open_sessions = await state.storage.get_open_sessions()
+        batch = [(guild.id, member.id) for member in rng.sample(members, min(args.afk_batch, len(members)))]
+        now = int(time.time())
+        for _, user_id in batch:
+            if user_id not in open_sessions:
+                await cog.open_session(state, user_id, now)
+        await recorder.time("loop:send_afk_checks", cog.send_afk_checks(batch))
+        await recorder.time("loop:expire_afk_checks", cog.expire_afk_checks(batch))
+
+    memory = {}
+    if args.tracemalloc:
+        memory["tracemalloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    await cog.cog_unload()
+    shutil.rmtree(workdir, ignore_errors=True)
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux and bytes on macOS.
+        scale = 2 ** 20 if os.uname().sysname == "Darwin" else 2 ** 10
+        memory["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "baseline")},
+        "results": recorder.summary(),
+        "memory": memory,
+    }
+
+
+def format_change(current: float, baseline: Optional[float]) -> str:
+    if not baseline:
+        return ""
+    return f"{(current - baseline) / baseline * 100:+.1f}%"
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    config = report["config"]
+    print(f"backend={config['backend']} staff={config['staff']} sessions/staff={config['sessions']} "
+          f"iterations={config['iterations']} ticks={config['ticks']} dm_latency={config['dm_latency']}s")
+    header = f"{'operation':<32}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    if baseline:
+        header += f"{'Δp50':>10}{'Δp95':>10}"
+    print(header)
+    print("-" * len(header))
+    baseline_results = baseline["results"] if baseline else {}
+    for name, stats in report["results"].items():
+        line = f"{name:<32}{stats['count']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        if baseline:
+            previous = baseline_results.get(name, {})
+            line += f"{format_change(stats['p50_ms'], previous.get('p50_ms')):>10}{format_change(stats['p95_ms'], previous.get('p95_ms')):>10}"
+        print(line)
+    for name, value in report["memory"].items():
+        line = f"{name}: {value:.1f}"
+        if baseline:
+            change = format_change(value, baseline.get("memory", {}).get(name))
+            if change:
+                line += f" ({change})"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency and memory benchmark for the timeclock cog.")
+    parser.add_argument("--backend", choices=("sqlite", "journal", "json"), default="sqlite")
+    parser.add_argument("--staff", type=int, default=200, help="Number of synthetic staff members.")
+    parser.add_argument("--sessions", type=int, default=200, help="Closed sessions per staff member.")
+    parser.add_argument("--days", type=int, default=90, help="Days of history the sessions are spread over.")
+    parser.add_argument("--open-ratio", type=float, default=0.1, help="Share of staff clocked in at start.")
+    parser.add_argument("--blocked-ratio", type=float, default=0.1, help="Share of staff with DMs closed.")
+    parser.add_argument("--dm-latency", type=float, default=0.0, help="Simulated seconds per DM send.")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per button and command.")
+    parser.add_argument("--ticks", type=int, default=5, help="Iterations of each background loop.")
+    parser.add_argument("--afk-batch", type=int, default=25, help="Users per simulated AFK check wave.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report the Python heap peak (slows every call down).")
+    parser.add_argument("--json", metavar="PATH", help="Write the report as JSON, e.g. to use as a baseline later.")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a report written with --json.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    report = asyncio.run(run_benchmark(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import asyncio
+import datetime
+from typing import Dict, Iterable, List, Optional
+
+import discord
+
+
+class FakeHTTPResponse:
+    """Just enough of an aiohttp response for `discord.HTTPException` to build its message."""
+
+    def __init__(self, status: int, reason: str = "", headers: Optional[dict] = None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+        self.members: List["FakeMember"] = []
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeMember:
+    """Guild member whose `send` costs `dm_latency` seconds and may raise `Forbidden` like a closed DM."""
+
+    def __init__(self, user_id: int, guild: "FakeGuild", roles: Iterable[FakeRole] = (), dms_open: bool = True, dm_latency: float = 0.0):
+        self.id = user_id
+        self.guild = guild
+        self.roles = list(roles)
+        self.bot = False
+        self.name = f"staff{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.display_avatar = FakeAsset(f"https://cdn.example/avatars/{user_id}.png")
+        self.dms_open = dms_open
+        self.dm_latency = dm_latency
+        self.sent_messages = 0
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        if self.dm_latency:
+            await asyncio.sleep(self.dm_latency)
+        if not self.dms_open:
+            raise discord.Forbidden(FakeHTTPResponse(403, "Forbidden"), "Cannot send messages to this user")
+        self.sent_messages += 1
+
+
+class FakeTextChannel:
+    def __init__(self, channel_id: int, guild: "FakeGuild"):
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+        self.sent_messages = 0
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        self.sent_messages += 1
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str = "Benchmark Guild"):
+        self.id = guild_id
+        self.name = name
+        self._members: Dict[int, FakeMember] = {}
+        self._roles: Dict[int, FakeRole] = {}
+        self._channels: Dict[int, FakeTextChannel] = {}
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    def add_role(self, role: FakeRole):
+        self._roles[role.id] = role
+
+    def add_channel(self, channel: FakeTextChannel):
+        self._channels[channel.id] = channel
+
+    def add_member(self, member: FakeMember):
+        self._members[member.id] = member
+        for role in member.roles:
+            role.members.append(member)
+
+    def get_member(self, user_id: int) -> Optional[FakeMember]:
+        return self._members.get(user_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self._roles.get(role_id)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeTextChannel]:
+        return self._channels.get(channel_id)
+
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    async def send(self, content: Optional[str] = None, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, channel: Optional[FakeTextChannel] = None):
+        self.user = user
+        self.guild = user.guild
+        self.guild_id = user.guild.id
+        self.channel = channel
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+class FakeBot:
+    """Stands in for `commands.Bot`: always ready, with every guild and its channels in cache."""
+
+    def __init__(self, guilds: Iterable[FakeGuild] = ()):
+        self.guilds = list(guilds)
+        self.persistent_views = []
+
+    def is_ready(self) -> bool:
+        return True
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeTextChannel]:
+        return next((guild.get_channel(channel_id) for guild in self.guilds if guild.get_channel(channel_id)), None)
+
+    def add_view(self, view, message_id: Optional[int] = None):
+        self.persistent_views.append(view)
@@ -4,7 +4,13 @@ import os
 import asyncio
 import sys
 import logging
+import time
 import colorlog
+from core.export import FORMATS, ReportWriter, report_range
+from core.metrics import GATEWAY_LATENCY_SECONDS, REGISTRY, start_metrics_server, watch_event_loop
+from core.startup import command_tree_hash, load_command_hashes, record_phase, save_command_hashes, timed_phase
+
+PROCESS_STARTED = time.perf_counter()
 
 def setup_logger():
     handler = colorlog.StreamHandler()
@@ -21,6 +27,14 @@ def setup_logger():
 setup_logger()
 
 BOT_TOKEN = "TOKEN_HERE"
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108  # None desativa o endpoint /metrics
+DATA_DIR = "/home/container/data"  # A mesma pasta onde o cog de atividade guarda os dados
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
+EXPORT_PART_BYTES = 32 * 1024 * 1024  # Tamanho máximo de cada ficheiro .gz exportado
+DEV_GUILD_ID = None  # ID de um servidor de testes: os comandos passam a ser sincronizados só nele (efeito imediato)
+COMMAND_HASH_FILE = os.path.join(DATA_DIR, "command_tree_hash.json")  # Hash da última árvore de comandos sincronizada
+DRAIN_SECONDS = 10  # Tempo máximo à espera das interações e tarefas em curso antes de um reload/restart/shutdown
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -29,32 +43,148 @@ intents.members = True
 class MyBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix="!", intents=intents)
+        self.metrics_server = None
+        self.loop_lag_task = None
+        self.setup_finished_at = None
 
     async def setup_hook(self):
-        logging.info("A carregar os cogs...")
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py'):
+        # setup_hook corre no fim do login HTTP, antes da ligação ao gateway.
+        record_phase("login", time.perf_counter() - PROCESS_STARTED)
+        GATEWAY_LATENCY_SECONDS.set_function(lambda: self.latency)
+        self.loop_lag_task = asyncio.create_task(watch_event_loop())
+        if METRICS_PORT:
+            with timed_phase("metrics_server"):
                 try:
-                    await self.load_extension(f'cogs.{filename[:-3]}')
-                    logging.info(f"  -> Cog '{filename}' carregado com sucesso.")
-                except Exception as e:
-                    logging.error(f"  -> Falha ao carregar o cog '{filename}': {e}")
+                    self.metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+                except OSError as e:
+                    logging.error(f"Falha ao iniciar o endpoint de métricas em {METRICS_HOST}:{METRICS_PORT}: {e}")
+        logging.info("A carregar os cogs...")
+        with timed_phase("load_cogs"):
+            await asyncio.gather(*(
+                self.load_cog(filename) for filename in sorted(os.listdir('./cogs')) if filename.endswith('.py')
+            ))
+        with timed_phase("command_sync"):
+            try:
+                await self.sync_commands()
+            except Exception as e:
+                logging.error(f"Falha ao sincronizar comandos: {e}")
+        self.setup_finished_at = time.perf_counter()
+
+    async def load_cog(self, filename):
+        started = time.perf_counter()
+        try:
+            await self.load_extension(f'cogs.{filename[:-3]}')
+            logging.info(f"  -> Cog '{filename}' carregado com sucesso ({(time.perf_counter() - started) * 1000:.0f} ms).")
+        except Exception as e:
+            logging.error(f"  -> Falha ao carregar o cog '{filename}': {e}")
+
+    async def sync_commands(self, force=False):
+        # Sincronizar é uma chamada global com rate limit; só é feita quando a árvore de comandos muda.
+        guild = discord.Object(id=DEV_GUILD_ID) if DEV_GUILD_ID else None
+        if guild:
+            self.tree.copy_global_to(guild=guild)
+        scope = f"{self.application_id}:{DEV_GUILD_ID or 'global'}"
+        digest = command_tree_hash(self.tree, guild)
+        hashes = load_command_hashes(COMMAND_HASH_FILE)
+        if not force and hashes.get(scope) == digest:
+            logging.info("Comandos de barra inalterados desde a última sincronização; nada a enviar.")
+            return
+        synced = await self.tree.sync(guild=guild)
+        hashes[scope] = digest
+        save_command_hashes(COMMAND_HASH_FILE, hashes)
+        where = f" no servidor {DEV_GUILD_ID}" if guild else ""
+        logging.info(f"Sincronizados {len(synced)} comandos de barra{where}.")
+
+    async def drain_cogs(self):
+        for cog in list(self.cogs.values()):
+            drain = getattr(cog, "drain", None)
+            if drain and not await drain(DRAIN_SECONDS):
+                logging.warning(f"O cog '{cog.qualified_name}' ainda tinha trabalho em curso ao fim de {DRAIN_SECONDS} s.")
+
+    async def hot_reload(self, extension):
+        # Recarrega o código sem desligar do gateway: os cogs antigos terminam o que está em curso
+        # e passam aos novos os dados abertos e os prazos pendentes.
+        started = time.perf_counter()
+        cogs = [cog for cog in self.cogs.values() if cog.__module__ == extension]
+        for cog in cogs:
+            prepare = getattr(cog, "prepare_handoff", None)
+            if prepare and not await prepare(DRAIN_SECONDS):
+                logging.warning(f"O cog '{cog.qualified_name}' ainda tinha trabalho em curso ao fim de {DRAIN_SECONDS} s.")
+        try:
+            await self.reload_extension(extension)
+        except Exception:
+            for cog in cogs:
+                if self.get_cog(cog.qualified_name) is cog and hasattr(cog, "resume"):
+                    cog.resume()
+            raise
+        logging.info(f"Extensão '{extension}' recarregada em {(time.perf_counter() - started) * 1000:.0f} ms, sem desligar do gateway.")
         try:
-            synced = await self.tree.sync()
-            logging.info(f"Sincronizados {len(synced)} comandos de barra.")
+            await self.sync_commands()
         except Exception as e:
-            logging.error(f"Falha ao sincronizar comandos: {e}")
+            logging.error(f"Extensão recarregada, mas falhou a sincronização dos comandos: {e}")
 
     async def on_ready(self):
+        if self.setup_finished_at is not None:
+            record_phase("gateway", time.perf_counter() - self.setup_finished_at)
+            record_phase("total", time.perf_counter() - PROCESS_STARTED)
+            self.setup_finished_at = None
         logging.info(f'Bot conectado como {self.user.name} ({self.user.id})')
         logging.info('------')
-        logging.info(">>> Bot operacional. Digite 'shutdown' ou 'restart' para gerir. <<<")
+        logging.info(">>> Bot operacional. Digite 'shutdown', 'restart' ou 'reload' para gerir. <<<")
         
         activity = discord.Streaming(name="AuroraMC", url="https://www.twitch.tv/aurora")
         await self.change_presence(status=discord.Status.online, activity=activity)
 
 bot = MyBot()
 
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+async def export_activity(activity_cog, args):
+    # export <csv|ndjson> [servidor=ID] [desde=AAAA-MM-DD] [ate=AAAA-MM-DD] [membro=ID] [cargo=ID]
+    if not args or args[0].lower() not in FORMATS:
+        logging.error("Uso incorreto. Use: export <csv|ndjson> [servidor=ID] [desde=AAAA-MM-DD] [ate=AAAA-MM-DD] [membro=ID] [cargo=ID]")
+        return
+    options = dict(arg.split("=", 1) for arg in args[1:] if "=" in arg)
+    try:
+        if "servidor" in options:
+            guild = bot.get_guild(int(options["servidor"]))
+        elif len(activity_cog.guild_states) == 1:
+            guild = bot.get_guild(next(iter(activity_cog.guild_states)))
+        else:
+            logging.error("Indique o servidor a exportar com servidor=ID.")
+            return
+        if guild is None:
+            logging.error("Servidor não encontrado.")
+            return
+        since, until = report_range(options.get("desde"), options.get("ate"))
+        user_ids = {int(options["membro"])} if "membro" in options else None
+        if "cargo" in options:
+            role = guild.get_role(int(options["cargo"]))
+            if role is None:
+                logging.error(f"Cargo '{options['cargo']}' não encontrado.")
+                return
+            role_member_ids = {member.id for member in role.members}
+            user_ids = role_member_ids if user_ids is None else user_ids & role_member_ids
+    except ValueError as e:
+        logging.error(f"Argumentos inválidos: {e}")
+        return
+
+    state = await activity_cog.open_guild(guild)
+    export_dir = os.path.join(EXPORT_DIR, str(guild.id))
+    os.makedirs(export_dir, exist_ok=True)
+    writer = ReportWriter(args[0].lower(), EXPORT_PART_BYTES)
+    paths = []
+    async for filename, data in activity_cog.export_report(state, writer, since, until, user_ids):
+        path = os.path.join(export_dir, filename)
+        await asyncio.to_thread(write_file, path, data)
+        paths.append(path)
+    if not paths:
+        logging.info("Nenhuma sessão corresponde aos filtros indicados.")
+    else:
+        logging.info(f"Exportadas {writer.rows} sessões para {len(paths)} ficheiro(s): {', '.join(paths)}")
+
 async def terminal_input_loop():
     while True:
         command = await asyncio.to_thread(sys.stdin.readline)
@@ -64,12 +194,26 @@ async def terminal_input_loop():
 
         if base_command == "shutdown":
             logging.warning("Comando 'shutdown' recebido. A encerrar...")
+            await bot.drain_cogs()
             await bot.close()
             break
         elif base_command == "restart":
             logging.warning("Comando 'restart' recebido. A reiniciar...")
+            await bot.drain_cogs()
             await bot.close()
             os.execv(sys.executable, ['python'] + sys.argv)
+
+        elif base_command == "reload":
+            # reload [cog] - aplica código novo de um cog (por omissão, timeclock) sem reiniciar o processo.
+            extension = f"cogs.{command_parts[1] if len(command_parts) > 1 else 'timeclock'}"
+            if extension not in bot.extensions:
+                logging.error(f"A extensão '{extension}' não está carregada.")
+                continue
+            logging.warning(f"Comando 'reload' recebido. A recarregar '{extension}'...")
+            try:
+                await bot.hot_reload(extension)
+            except Exception as e:
+                logging.error(f"Falha ao recarregar '{extension}': {e}")
         
         elif base_command == "teste":
             if len(command_parts) < 2:
@@ -85,6 +229,40 @@ async def terminal_input_loop():
                 except ValueError:
                     logging.error(f"ID de utilizador inválido: '{command_parts[1]}'.")
 
+        elif base_command == "verify":
+            activity_cog = bot.get_cog("ActivityCog")
+            if not activity_cog:
+                logging.error("O cog 'ActivityCog' não está carregado.")
+                continue
+            for state in list(activity_cog.guild_states.values()):
+                mismatched = await state.storage.verify_totals()
+                if not mismatched:
+                    logging.info(f"Servidor {state.guild_id}: totais por utilizador verificados, tudo consistente.")
+                else:
+                    logging.warning(f"Servidor {state.guild_id}: totais inconsistentes para {len(mismatched)} utilizador(es): {mismatched}. A reconstruir...")
+                    await activity_cog.rebuild_totals(state)
+                    logging.info(f"Servidor {state.guild_id}: totais reconstruídos a partir do histórico completo.")
+
+        elif base_command == "export":
+            activity_cog = bot.get_cog("ActivityCog")
+            if not activity_cog:
+                logging.error("O cog 'ActivityCog' não está carregado.")
+                continue
+            await export_activity(activity_cog, command_parts[1:])
+
+        elif base_command == "sync":
+            try:
+                await bot.sync_commands(force=True)
+            except Exception as e:
+                logging.error(f"Falha ao sincronizar comandos: {e}")
+
+        elif base_command == "stats":
+            lines = REGISTRY.summary_lines()
+            if not lines:
+                logging.info("Ainda não há métricas registadas.")
+            for line in lines:
+                logging.info(line)
+
 async def main():
     asyncio.create_task(terminal_input_loop())
     await bot.start(BOT_TOKEN)
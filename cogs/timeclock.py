@@ -1,32 +1,72 @@
 import discord
 from discord import ui, app_commands
 from discord.ext import commands, tasks
-import json
-import os
+import asyncio
 import datetime
+import functools
+import io
+import os
+import time
+from typing import Dict, Optional
+import logging
+from core.dispatch import BLOCKED, SENT, DMDispatcher
+from core.archive import month_start
+from core.cards import ActivityCard
+from core.export import ReportWriter, filter_sessions, report_filename, report_range
+from core.guilds import GuildConfig, GuildState, adopt_legacy_files, partition_dir, partition_path, stored_guild_ids
+from core.leaderboard import Leaderboard, rank_totals
+from core.lifecycle import BACKGROUND, INTERACTIONS, put_handoff, take_handoff
+from core.metrics import CARD_CACHE_LOOKUPS, LIVE_PANEL_EDITS, LOOP_SECONDS, STORAGE_BYTES, timed, timed_interaction
+from core.rollups import window_bounds, window_label
+from core.scheduler import DeadlineScheduler
+from core.startup import timed_phase
+from core.storage import LEGACY_AFK_DEADLINE, open_storage
 
+STORAGE_BACKEND = "sqlite"
+DATABASE_FILE = "/home/container/data/activity_data.db"
+SNAPSHOT_FILE = "/home/container/data/activity_snapshot.json"
 DATA_FILE = "/home/container/data/activity_data.json"
+# Per-guild settings are stored with each guild's data and changed with /activityconfig. The IDs, goals
+# and window below only seed the guild that owns LOG_CHANNEL_ID (the single server this bot used to
+# serve); QUOTA_WINDOW and QUOTA_WINDOW_ROLLING are also the defaults for every other guild.
 LOGO_URL = "https://media.discordapp.net/attachments/1342569230339670086/1400853213539729428/cc2356a6-f64e-4178-8c07-7df0d5f0f930-removebg-preview.png"
 IMAGE_URL = "https://media.discordapp.net/attachments/1342569230339670086/1428466536783544413/Gemini_Generated_Image_nqb14wnqb14wnqb1_2.png"
 LOG_CHANNEL_ID = 1428471793496358942
 NOTIFICATION_COOLDOWN_HOURS = 6
 AFK_CHECK_HOURS = 3
 AFK_RESPONSE_MINUTES = 10
+AFK_RETRY_MINUTES = 5
+DM_CONCURRENCY = 8
 AFK_LOG_PING_ROLE_ID = 1342569119869829123
+QUOTA_WINDOW = "weekly"
+QUOTA_WINDOW_ROLLING = False
 ROLE_GOALS = {
     1342569124554866801: {"name": "Helper", "seconds": 30 * 60},
     1342569120981454868: {"name": "Admin", "seconds": 90 * 60},
     1342569121736294505: {"name": "Moderator", "seconds": 60 * 60},
     1401918325235388497: {"name": "Trainee", "seconds": 25 * 60}
 }
-
-def get_data():
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
-
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_PERIODS = {"all": "lifetime", "week": "weekly", "month": "monthly"}
+RANK_EMOJIS = ["🥇", "🥈", "🥉"]
+WINDOW_CHOICES = [
+    app_commands.Choice(name="Daily", value="daily"),
+    app_commands.Choice(name="Weekly", value="weekly"),
+    app_commands.Choice(name="Monthly", value="monthly"),
+    app_commands.Choice(name="All time", value="lifetime")
+]
+REPORT_PART_BYTES = 8 * 1024 * 1024
+REPORT_BATCH_ROWS = 2000
+# Sessions that ended in a month wholly older than this are moved out of the live store into
+# compressed per-month files (data dir/guilds/<id>/archive/). None keeps everything live.
+ARCHIVE_AFTER_DAYS = 180
+# How long a panel or AFK button clicked during a reload waits for the reloaded cog before
+# asking the member to try again; Discord needs the interaction answered within 3 s.
+REPLACEMENT_WAIT_SECONDS = 2.0
+RESTARTING_MESSAGE = "⏳ The bot is restarting, please try again in a few seconds."
+# The live "currently clocked in" message is edited at most once per this many seconds per guild,
+# however many members clock in or out in between.
+LIVE_PANEL_REFRESH_SECONDS = 10
 
 def format_duration(total_seconds: float, simple: bool = False) -> str:
     if total_seconds < 0: total_seconds = 0
@@ -39,159 +79,194 @@ def format_duration(total_seconds: float, simple: bool = False) -> str:
     elif minutes > 0: return f"{minutes}m {seconds}s"
     else: return f"{seconds}s"
 
-def ensure_data_file():
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "w") as f:
-            json.dump({
-                "currently_clocked_in": {},
-                "time_logs": {},
-                "last_quota_notification": {},
-                "afk_check_sent": {}
-            }, f, indent=4)
-
-class AFKCheckView(ui.View):
-    def __init__(self, member: discord.Member, bot_instance):
-        super().__init__(timeout=AFK_RESPONSE_MINUTES * 60)
-        self.member = member
-        self.bot = bot_instance
-        self.responded = False
+def storage_path() -> str:
+    if STORAGE_BACKEND == "json":
+        return DATA_FILE
+    if STORAGE_BACKEND == "journal":
+        return SNAPSHOT_FILE
+    return DATABASE_FILE
+
+def create_storage(guild_id: int):
+    legacy_json_path = partition_path(DATA_FILE, guild_id)
+    if STORAGE_BACKEND == "json":
+        return open_storage("json", legacy_json_path)
+    return open_storage(STORAGE_BACKEND, partition_path(storage_path(), guild_id), legacy_json_path=legacy_json_path)
+
+def default_config() -> GuildConfig:
+    return GuildConfig(quota_window=QUOTA_WINDOW, quota_window_rolling=QUOTA_WINDOW_ROLLING)
+
+def legacy_config() -> GuildConfig:
+    return GuildConfig(LOG_CHANNEL_ID, AFK_LOG_PING_ROLE_ID, ROLE_GOALS, QUOTA_WINDOW, QUOTA_WINDOW_ROLLING)
+
+def join_limited(lines, limit: int = 1024) -> str:
+    text = ""
+    for index, line in enumerate(lines):
+        remaining = len(lines) - index
+        suffix = f"\n… and {remaining} more" if remaining > 1 else ""
+        if len(text) + len(line) + 1 + len(suffix) > limit:
+            return text + f"… and {remaining} more"
+        text += line + "\n"
+    return text.rstrip("\n")
+
+def format_rank(position: int) -> str:
+    return RANK_EMOJIS[position - 1] if position <= len(RANK_EMOJIS) else f"**#{position}**"
+
+def activity_embed(card: ActivityCard, title: str, member: discord.Member, no_goals_text: str) -> discord.Embed:
+    embed = discord.Embed(title=title, color=discord.Color.blue())
+    embed.set_thumbnail(url=member.display_avatar.url)
+    embed.add_field(name="Total Dedicated Time", value=card.total, inline=False)
+    embed.add_field(name="Activity Goals", value=card.goals or no_goals_text, inline=False)
+    if card.recent:
+        embed.add_field(name="Recent Sessions", value=card.recent, inline=False)
+    return embed
+
+class CogView(ui.View):
+    """Persistent view of the activity cog; clicks that arrive while the cog is being reloaded are passed to the new instance."""
+
+    # Reply for clicks the reloaded cog has no counterpart view for.
+    gone_message = RESTARTING_MESSAGE
+
+    def __init__(self, cog: "ActivityCog"):
+        super().__init__(timeout=None)
+        self.cog = cog
+
+    def counterpart(self, cog: "ActivityCog") -> Optional[ui.View]:
+        """The view of `cog` that took over this view's custom IDs, if any."""
+        return None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if not self.cog.closing:
+            return True
+        replacement = await self.cog.wait_for_replacement()
+        if replacement is None:
+            await interaction.response.send_message(RESTARTING_MESSAGE, ephemeral=True)
+            return False
+        view = self.counterpart(replacement)
+        custom_id = (interaction.data or {}).get("custom_id")
+        item = next((item for item in view.children if getattr(item, "custom_id", None) == custom_id), None) if view is not None else None
+        if item is None:
+            await interaction.response.send_message(RESTARTING_MESSAGE if replacement.closing else self.gone_message, ephemeral=True)
+            return False
+        # The new view runs its own check first, so a shutdown right after the reload is still refused.
+        if await view.interaction_check(interaction):
+            await item.callback(interaction)
+        return False
+
+class AFKCheckView(CogView):
+    gone_message = "This activity check has already expired."
+
+    def __init__(self, guild_id: int, user_id: int, cog: "ActivityCog"):
+        super().__init__(cog)
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.deadline: Optional[int] = None
+        self.confirm_active.custom_id = f"afk_confirm_yes:{guild_id}:{user_id}"
 
     @ui.button(label="Yes, I'm active!", style=discord.ButtonStyle.green, custom_id="afk_confirm_yes")
+    @timed_interaction("afk_confirm")
     async def confirm_active(self, interaction: discord.Interaction, button: ui.Button):
-        self.responded = True
-        await interaction.response.send_message("Thanks for confirming! Your activity log continues.", ephemeral=True)
         for item in self.children:
             item.disabled = True
-        await interaction.edit_original_response(view=self)
-        self.stop()
+        await interaction.response.edit_message(view=self)
+        if await self.cog.resolve_afk_check(self.guild_id, self.user_id):
+            await interaction.followup.send("Thanks for confirming! Your activity log continues.", ephemeral=True)
+        else:
+            await interaction.followup.send(self.gone_message, ephemeral=True)
 
-    async def on_timeout(self):
-        if self.responded:
-            return
+    def counterpart(self, cog: "ActivityCog") -> Optional[ui.View]:
+        return cog.afk_views.get((self.guild_id, self.user_id))
 
-        data = get_data()
-        user_id = str(self.member.id)
+class LeaderboardView(ui.View):
+    def __init__(self, title: str, fetch_page, total_entries: int):
+        super().__init__(timeout=180)
+        self.title = title
+        self.fetch_page = fetch_page
+        self.total_entries = total_entries
+        self.page = 0
+        self.page_count = max(1, -(-total_entries // LEADERBOARD_PAGE_SIZE))
+        self._update_buttons()
 
-        if user_id not in data.get("currently_clocked_in", {}):
-            return
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
 
-        start_time_iso = data["currently_clocked_in"].pop(user_id)
-        start_time = datetime.datetime.fromisoformat(start_time_iso)
-        end_time = datetime.datetime.now(datetime.timezone.utc)
-        duration = end_time - start_time
+    def build_embed(self) -> discord.Embed:
+        offset = self.page * LEADERBOARD_PAGE_SIZE
+        description_text = ""
+        for position, (user_id, total_seconds) in enumerate(self.fetch_page(offset, LEADERBOARD_PAGE_SIZE), offset + 1):
+            description_text += f"{format_rank(position)} <@{user_id}> - `{format_duration(total_seconds)}`\n"
+        if not description_text:
+            description_text = "No staff members with recorded time for this ranking."
+        embed = discord.Embed(title=self.title, description=description_text, color=discord.Color.gold())
+        embed.set_footer(text=f"Page {self.page + 1}/{self.page_count} • {self.total_entries} ranked members")
+        return embed
 
-        if user_id not in data["time_logs"]:
-            data["time_logs"][user_id] = []
-        
-        log_entry = {"start": start_time.isoformat(), "end": end_time.isoformat(), "duration_seconds": duration.total_seconds()}
-        data["time_logs"][user_id].append(log_entry)
-        
-        if user_id in data.get("afk_check_sent", {}):
-            del data["afk_check_sent"][user_id]
-        save_data(data)
+    @ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    @timed_interaction("leaderboard_page")
+    async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
+        self.page = max(0, self.page - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
 
-        log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
-        if log_channel:
-            log_embed = discord.Embed(
-                title="🚨 Activity Stopped Due to Inactivity (AFK)",
-                description=f"The activity of {self.member.mention} was automatically stopped due to no response to the check.\n\n"
-                            f"**Possible AFK.** <@&{AFK_LOG_PING_ROLE_ID}>",
-                color=discord.Color.red(),
-                timestamp=datetime.datetime.now(datetime.timezone.utc)
-            )
-            await log_channel.send(embed=log_embed)
+    @ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    @timed_interaction("leaderboard_page")
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        self.page = min(self.page_count - 1, self.page + 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+class ActivityPanelView(CogView):
+    def counterpart(self, cog: "ActivityCog") -> Optional[ui.View]:
+        return cog.panel_view
 
-class ActivityPanelView(ui.View):
-    def __init__(self):
-        super().__init__(timeout=None)
-    
     @ui.button(label="Clock In", style=discord.ButtonStyle.green, custom_id="clock_in_button")
+    @timed_interaction("clock_in")
     async def clock_in(self, interaction: discord.Interaction, button: ui.Button):
-        user_id = str(interaction.user.id)
-        data = get_data()
-        if user_id in data["currently_clocked_in"]:
+        state = await self.cog.open_guild(interaction.guild)
+        start_time = datetime.datetime.now(datetime.timezone.utc)
+        if not await self.cog.open_session(state, interaction.user.id, int(start_time.timestamp())):
             await interaction.response.send_message("❌ You have already clocked in!", ephemeral=True)
             return
-        start_time = datetime.datetime.now(datetime.timezone.utc)
-        data["currently_clocked_in"][user_id] = start_time.isoformat()
-        save_data(data)
         embed = discord.Embed(title="✅ Activity Started", description="Your activity session has begun. Thank you for your dedication!", color=discord.Color.green())
         embed.add_field(name="Start Time", value=f"<t:{int(start_time.timestamp())}:F>")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @ui.button(label="Clock Out", style=discord.ButtonStyle.red, custom_id="clock_out_button")
+    @timed_interaction("clock_out")
     async def clock_out(self, interaction: discord.Interaction, button: ui.Button):
-        user_id = str(interaction.user.id)
-        data = get_data()
-        if user_id not in data["currently_clocked_in"]:
+        state = await self.cog.open_guild(interaction.guild)
+        end_time = datetime.datetime.now(datetime.timezone.utc)
+        session = await self.cog.close_session(state, interaction.user.id, int(end_time.timestamp()))
+        if session is None:
             await interaction.response.send_message("❌ You need to clock in first!", ephemeral=True)
             return
-        start_time_iso = data["currently_clocked_in"].pop(user_id)
-        start_time = datetime.datetime.fromisoformat(start_time_iso)
-        end_time = datetime.datetime.now(datetime.timezone.utc)
-        duration = end_time - start_time
-        if user_id not in data["time_logs"]:
-            data["time_logs"][user_id] = []
-        log_entry = {"start": start_time.isoformat(), "end": end_time.isoformat(), "duration_seconds": duration.total_seconds()}
-        data["time_logs"][user_id].append(log_entry)
-        save_data(data)
         embed = discord.Embed(title="✅ Activity Finished", description="Your activity session has ended. We appreciate your time!", color=discord.Color.red())
-        embed.add_field(name="Session Duration", value=format_duration(duration.total_seconds()))
+        embed.add_field(name="Session Duration", value=format_duration(session.duration))
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @ui.button(label="My Info", style=discord.ButtonStyle.secondary, custom_id="my_info_button")
+    @timed_interaction("my_info")
     async def my_info(self, interaction: discord.Interaction, button: ui.Button):
-        user_id = str(interaction.user.id)
-        member = interaction.user
-        data = get_data()
-        user_logs = data["time_logs"].get(user_id, [])
-        if not user_logs:
+        state = await self.cog.open_guild(interaction.guild)
+        card = await self.cog.activity_card(state, interaction.user)
+        if card is None:
             await interaction.response.send_message("You don't have any activity records yet.", ephemeral=True)
             return
-        total_seconds_worked = sum(log["duration_seconds"] for log in user_logs)
-        
-        embed = discord.Embed(title="Your Activity Time", color=discord.Color.blue())
-        embed.set_thumbnail(url=interaction.user.display_avatar.url)
-        embed.add_field(name="Total Dedicated Time", value=f"**{format_duration(total_seconds_worked)}**", inline=False)
-        
-        goals_text = ""
-        user_role_ids = [role.id for role in member.roles]
-        for role_id, info in ROLE_GOALS.items():
-            if role_id in user_role_ids:
-                goal_seconds = info["seconds"]
-                progress_percent = (total_seconds_worked / goal_seconds) * 100 if goal_seconds > 0 else 100
-                time_worked_str = format_duration(total_seconds_worked)
-                goal_time_str = format_duration(goal_seconds)
-                goals_text += f"<@&{role_id}>: `{time_worked_str} / {goal_time_str}` **({progress_percent:.1f}%)**\n"
-        
-        if not goals_text:
-            goals_text = "You do not have a role with an activity goal."
-        embed.add_field(name="Activity Goals", value=goals_text, inline=False)
-        
-        recent_sessions_text = ""
-        for log in reversed(user_logs[-5:]):
-            start_ts = int(datetime.datetime.fromisoformat(log["start"]).timestamp())
-            duration_str = format_duration(log["duration_seconds"])
-            recent_sessions_text += f"• <t:{start_ts}:d> - Duration: `{duration_str}`\n"
-        if recent_sessions_text:
-            embed.add_field(name="Recent Sessions", value=recent_sessions_text, inline=False)
+        embed = activity_embed(card, "Your Activity Time", interaction.user, "You do not have a role with an activity goal.")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @ui.button(label="Top Staff", style=discord.ButtonStyle.secondary, custom_id="top_staff_button")
+    @timed_interaction("top_staff")
     async def top_3_staff(self, interaction: discord.Interaction, button: ui.Button):
-        data = get_data()
-        time_logs = data.get("time_logs", {})
-        if not time_logs:
+        state = await self.cog.open_guild(interaction.guild)
+        top_staff = state.leaderboard.top(3)
+        if not top_staff:
             await interaction.response.send_message("There are no activity records yet to generate a ranking.", ephemeral=True)
             return
-        staff_totals = {user_id: sum(log["duration_seconds"] for log in logs) for user_id, logs in time_logs.items()}
-        sorted_staff = sorted(staff_totals.items(), key=lambda item: item[1], reverse=True)
         embed = discord.Embed(title="Top 3 Staff", description="Ranking based on total recorded activity time.", color=discord.Color.gold())
         description_text = ""
-        rank_emojis = ["🥇", "🥈", "🥉"]
-        for i, (user_id, total_seconds) in enumerate(sorted_staff[:3]):
-            rank_emoji = rank_emojis[i]
+        for i, (user_id, total_seconds) in enumerate(top_staff):
+            rank_emoji = RANK_EMOJIS[i]
             duration_str = format_duration(total_seconds)
             description_text += f"{rank_emoji} <@{user_id}> - `{duration_str}`\n"
         if not description_text:
@@ -200,171 +275,718 @@ class ActivityPanelView(ui.View):
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class ActivityCog(commands.Cog):
+    activity_config = app_commands.Group(name="activityconfig", description="Configures activity tracking for this server.", guild_only=True)
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        ensure_data_file()
-        self.bot.add_view(ActivityPanelView())
+        self.guild_states: Dict[int, GuildState] = {}
+        self._open_locks: Dict[int, asyncio.Lock] = {}
+        self.afk_scheduler = DeadlineScheduler(self.send_afk_checks)
+        self.afk_response_scheduler = DeadlineScheduler(self.expire_afk_checks)
+        self.live_panel_scheduler = DeadlineScheduler(self.refresh_live_panels)
+        self.afk_views = {}
+        self.dm_dispatcher = DMDispatcher(DM_CONCURRENCY)
+        self.warm_task = None
+        self.panel_view = None
+        self.panel_message_views = []
+        self.closing = False
+        self.handing_off = False
+
+    async def cog_load(self):
+        self.panel_view = ActivityPanelView(self)
+        self.bot.add_view(self.panel_view)
+        handoff = take_handoff(self.qualified_name)
+        if handoff is not None:
+            self.adopt_handoff(handoff)
+        self.afk_scheduler.start()
+        self.afk_response_scheduler.start()
+        self.live_panel_scheduler.start()
         self.check_staff_quotas.start()
-        self.check_afk_staff.start()
+        self.maintain_storage.start()
+        self.archive_old_sessions.start()
+        if self.bot.is_ready():
+            await self.open_known_guilds()
+        else:
+            # Open the stores found on disk while the gateway connects instead of after on_ready.
+            self.warm_task = asyncio.create_task(self.open_stored_guilds())
 
-    def cog_unload(self):
+    async def cog_unload(self):
+        if self.warm_task is not None:
+            self.warm_task.cancel()
+            await asyncio.gather(self.warm_task, return_exceptions=True)
         self.check_staff_quotas.cancel()
-        self.check_afk_staff.cancel()
+        self.afk_scheduler.stop()
+        self.afk_response_scheduler.stop()
+        self.live_panel_scheduler.stop()
+        self.maintain_storage.cancel()
+        self.archive_old_sessions.cancel()
+        if self.handing_off:
+            # Stores stay open and AFK views stay registered until the reloaded cog adopts the
+            # stores and registers its own views under the same custom IDs.
+            put_handoff(self.qualified_name, {
+                "guild_states": dict(self.guild_states),
+                "afk_checks": self.afk_scheduler.snapshot(),
+                "afk_responses": self.afk_response_scheduler.snapshot(),
+                "live_panels": self.live_panel_scheduler.snapshot()
+            })
+        else:
+            await asyncio.gather(*(state.close() for state in self.guild_states.values()))
+        # Stopping unregisters the views, including the ones bound to AFK DMs and panel messages, so
+        # after a reload those clicks fall through to the persistent views of the new instance.
+        for view in [self.panel_view, *self.panel_message_views, *self.afk_views.values()]:
+            if view is not None:
+                view.stop()
+        self.afk_views.clear()
+        self.panel_message_views.clear()
+        self.guild_states.clear()
+
+    def background_loops(self):
+        return (self.check_staff_quotas, self.maintain_storage, self.archive_old_sessions)
+
+    async def drain(self, timeout: float) -> bool:
+        """Stops background work and waits for running interactions, AFK waves and loop iterations.
+
+        Returns False if something was still running after `timeout` seconds.
+        The stores are flushed either way.
+        """
+        self.closing = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for task_loop in self.background_loops():
+            task_loop.stop()
+        drained = await INTERACTIONS.wait_idle(timeout)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(self.afk_scheduler.drain(), self.afk_response_scheduler.drain(), self.live_panel_scheduler.drain()),
+                max(0.0, deadline - loop.time())
+            )
+        except asyncio.TimeoutError:
+            drained = False
+        drained = await BACKGROUND.wait_idle(max(0.0, deadline - loop.time())) and drained
+        for task_loop in self.background_loops():
+            task_loop.cancel()
+        await self.for_each_guild(lambda state: state.storage.maintain())
+        return drained
+
+    async def prepare_handoff(self, timeout: float) -> bool:
+        """Drains this instance so the one `reload_extension` creates can take over its stores and AFK deadlines."""
+        self.handing_off = True
+        return await self.drain(timeout)
+
+    def resume(self):
+        """Restarts the work `drain` stopped, for when the reload did not happen."""
+        self.closing = self.handing_off = False
+        self.afk_scheduler.start()
+        self.afk_response_scheduler.start()
+        self.live_panel_scheduler.start()
+        for task_loop in self.background_loops():
+            if not task_loop.is_running():
+                task_loop.start()
+
+    def adopt_handoff(self, handoff: dict):
+        self.guild_states.update(handoff["guild_states"])
+        for key, deadline in handoff["afk_checks"].items():
+            self.afk_scheduler.schedule(key, deadline)
+        for (guild_id, user_id), deadline in handoff["afk_responses"].items():
+            self.attach_afk_view(guild_id, user_id, deadline)
+        for guild_id, deadline in handoff["live_panels"].items():
+            self.live_panel_scheduler.schedule(guild_id, deadline)
+        logging.info(f"Took over {len(self.guild_states)} guild activity stores and "
+                     f"{len(handoff['afk_checks']) + len(handoff['afk_responses'])} AFK deadlines from the previous cog instance.")
+
+    async def wait_for_replacement(self) -> Optional["ActivityCog"]:
+        """The instance that replaced this one after a reload, or None if none was loaded in time."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REPLACEMENT_WAIT_SECONDS
+        while self.handing_off and loop.time() < deadline:
+            # add_cog only registers a cog after its cog_load has finished.
+            cog = self.bot.get_cog(self.qualified_name)
+            if cog is not None and cog is not self:
+                return cog
+            await asyncio.sleep(0.05)
+        return None
+
+    def legacy_guild_id(self) -> Optional[int]:
+        log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
+        return log_channel.guild.id if log_channel else None
+
+    async def open_known_guilds(self):
+        legacy_guild_id = self.legacy_guild_id()
+        guilds = [
+            guild for guild in self.bot.guilds
+            if guild.id == legacy_guild_id or os.path.isdir(partition_dir(storage_path(), guild.id))
+        ]
+        await asyncio.gather(*(self.open_guild(guild) for guild in guilds))
+
+    async def open_stored_guilds(self):
+        guild_ids = stored_guild_ids(storage_path())
+        with timed_phase("warm_storage"):
+            results = await asyncio.gather(*(self.open_guild_state(guild_id) for guild_id in guild_ids), return_exceptions=True)
+        for guild_id, result in zip(guild_ids, results):
+            if isinstance(result, Exception):
+                logging.error(f"Could not open the activity store of guild {guild_id}.", exc_info=result)
+        logging.info(f"Opened {len(guild_ids)} guild activity stores while connecting to the gateway.")
+
+    async def open_guild(self, guild: discord.Guild) -> GuildState:
+        state = self.guild_states.get(guild.id)
+        if state is not None:
+            return state
+        return await self.open_guild_state(guild.id, guild)
+
+    async def open_guild_state(self, guild_id: int, guild: Optional[discord.Guild] = None) -> GuildState:
+        """Opens a guild's store; without `guild` (before on_ready) legacy files are not adopted and the staff index stays empty."""
+        async with self._open_locks.setdefault(guild_id, asyncio.Lock()):
+            state = self.guild_states.get(guild_id)
+            if state is not None:
+                return state
+            seed = None
+            if guild is not None and guild_id == self.legacy_guild_id():
+                for path in {storage_path(), DATA_FILE}:
+                    adopt_legacy_files(path, guild_id)
+                seed = legacy_config()
+            state = await GuildState.open(guild_id, functools.partial(create_storage, guild_id), default_config(), seed)
+            afk_checks = await state.storage.get_afk_checks()
+            for user_id, start_ts in (await state.storage.get_open_sessions()).items():
+                deadline = afk_checks.get(user_id)
+                if deadline is None:
+                    self.afk_scheduler.schedule((guild_id, user_id), start_ts + AFK_CHECK_HOURS * 3600)
+                elif deadline:
+                    if deadline == LEGACY_AFK_DEADLINE:
+                        # Sent by a version that never stored the deadline; it ran out this long after the start.
+                        deadline = start_ts + AFK_CHECK_HOURS * 3600 + AFK_RESPONSE_MINUTES * 60
+                    self.attach_afk_view(guild_id, user_id, deadline)
+            if guild is not None:
+                self.seed_staff_index(state, guild)
+            self.guild_states[guild_id] = state
+            # An edit still pending when the bot stopped was lost with it.
+            self.touch_live_panel(state)
+            return state
+
+    async def for_each_guild(self, func, states=None):
+        states = list(self.guild_states.values()) if states is None else list(states)
+        results = await asyncio.gather(*(func(state) for state in states), return_exceptions=True)
+        for state, result in zip(states, results):
+            if isinstance(result, Exception):
+                logging.error(f"Activity task failed for guild {state.guild_id}.", exc_info=result)
+
+    def group_by_guild(self, keys) -> Dict[GuildState, list]:
+        grouped = {}
+        for guild_id, user_id in keys:
+            state = self.guild_states.get(guild_id)
+            if state is not None:
+                grouped.setdefault(state, []).append(user_id)
+        return grouped
+
+    async def open_session(self, state: GuildState, user_id: int, start: int) -> bool:
+        async with state.storage.lock:
+            if not await state.storage.clock_in(user_id, start):
+                return False
+            self.afk_scheduler.schedule((state.guild_id, user_id), start + AFK_CHECK_HOURS * 3600)
+            self.touch_live_panel(state)
+            return True
+
+    async def close_session(self, state: GuildState, user_id: int, end: int, reason: str = "clock_out"):
+        async with state.storage.lock:
+            session = await state.storage.clock_out(user_id, end, reason=reason)
+            if session is not None:
+                self.afk_scheduler.cancel((state.guild_id, user_id))
+                self.detach_afk_view(state.guild_id, user_id)
+                state.leaderboard.update(user_id, await state.storage.get_total(user_id))
+                state.cards.invalidate(user_id)
+                self.touch_live_panel(state)
+            return session
+
+    async def rebuild_totals(self, state: GuildState):
+        async with state.storage.lock:
+            await state.storage.rebuild_totals()
+            state.leaderboard = Leaderboard(await state.storage.get_all_totals())
+            state.cards.clear()
+
+    async def goal_progress(self, state: GuildState, user_id: int, role_ids, total_seconds: float, now: float):
+        config = state.config
+        window_totals = {}
+        progress = []
+        for role_id, info in config.role_goals.items():
+            if role_id not in role_ids: continue
+            window = config.goal_window(info)
+            if window not in window_totals:
+                bounds = window_bounds(window, config.quota_window_rolling, now)
+                window_totals[window] = total_seconds if bounds is None else await state.storage.get_window_total(user_id, *bounds)
+            progress.append((role_id, info, window_totals[window], window_label(window, config.quota_window_rolling)))
+        return progress
+
+    async def activity_card(self, state: GuildState, member: discord.Member) -> Optional[ActivityCard]:
+        """Total, goal progress and recent sessions of `member`; None if they have no closed session.
+
+        Served from the guild's card cache until the member closes a session, their goal
+        roles change, a goal window rolls over to a new day or the goals are reconfigured.
+        """
+        config = state.config
+        now = time.time()
+        role_ids = frozenset(role.id for role in member.roles if role.id in config.role_goals)
+        windows = sorted({config.goal_window(config.role_goals[role_id]) for role_id in role_ids})
+        stamp = (state.cards.version(member.id), role_ids, tuple(window_bounds(window, config.quota_window_rolling, now) for window in windows))
+        card = state.cards.get(member.id, stamp)
+        if card is not None:
+            CARD_CACHE_LOOKUPS.labels(result="hit").inc()
+            return card
+        CARD_CACHE_LOOKUPS.labels(result="miss").inc()
+        totals = await state.storage.get_user_totals(member.id)
+        if not totals.session_count:
+            return None
+
+        goals_text = ""
+        for role_id, info, worked_seconds, window_text in await self.goal_progress(state, member.id, role_ids, totals.total_seconds, now):
+            goal_seconds = info["seconds"]
+            progress_percent = (worked_seconds / goal_seconds) * 100 if goal_seconds > 0 else 100
+            goals_text += f"<@&{role_id}>: `{format_duration(worked_seconds)} / {format_duration(goal_seconds)}` **({progress_percent:.1f}%)** {window_text}\n"
+        recent_sessions_text = ""
+        for session in reversed(totals.recent):
+            recent_sessions_text += f"• <t:{session.start}:d> - Duration: `{format_duration(session.duration)}`\n"
+
+        card = ActivityCard(f"**{format_duration(totals.total_seconds)}**", goals_text or None, recent_sessions_text or None)
+        state.cards.put(member.id, stamp, card)
+        return card
+
+    def touch_live_panel(self, state: GuildState):
+        """Schedules an edit of the guild's live panel unless one is already pending, so a burst of changes costs one edit."""
+        if state.config.live_panel_message_id is not None and state.guild_id not in self.live_panel_scheduler:
+            self.live_panel_scheduler.schedule(state.guild_id, time.time() + LIVE_PANEL_REFRESH_SECONDS)
+
+    async def live_panel_embed(self, state: GuildState) -> discord.Embed:
+        open_sessions = sorted((await state.storage.get_open_sessions()).items(), key=lambda item: item[1])
+        lines = [f"<@{user_id}> - since <t:{start_ts}:R>" for user_id, start_ts in open_sessions]
+        embed = discord.Embed(
+            title=f"🟢 Currently Clocked In ({len(lines)})",
+            description=join_limited(lines, 4096) or "Nobody is clocked in right now.",
+            color=discord.Color.green(),
+            timestamp=datetime.datetime.now(datetime.timezone.utc)
+        )
+        embed.set_footer(text="Last updated")
+        return embed
+
+    def attach_afk_view(self, guild_id: int, user_id: int, deadline: int, view: Optional[AFKCheckView] = None) -> AFKCheckView:
+        if view is None:
+            view = AFKCheckView(guild_id, user_id, self)
+            self.bot.add_view(view)
+        view.deadline = deadline
+        self.afk_views[(guild_id, user_id)] = view
+        self.afk_response_scheduler.schedule((guild_id, user_id), deadline)
+        return view
+
+    def detach_afk_view(self, guild_id: int, user_id: int) -> Optional[AFKCheckView]:
+        self.afk_response_scheduler.cancel((guild_id, user_id))
+        view = self.afk_views.pop((guild_id, user_id), None)
+        if view is not None:
+            view.stop()
+        return view
+
+    async def resolve_afk_check(self, guild_id: int, user_id: int) -> bool:
+        state = self.guild_states.get(guild_id)
+        if state is None:
+            return False
+        async with state.storage.lock:
+            if (guild_id, user_id) not in self.afk_response_scheduler:
+                return False
+            self.detach_afk_view(guild_id, user_id)
+            await state.storage.resolve_afk_check(user_id)
+            return True
+
+    def seed_staff_index(self, state: GuildState, guild: discord.Guild):
+        role_members = {}
+        for role_id in state.config.role_goals:
+            role = guild.get_role(role_id)
+            if role:
+                role_members[role_id] = [member.id for member in role.members if not member.bot]
+        state.staff_index.seed(role_members)
+        logging.info(f"Staff index for '{guild.name}' seeded with {len(state.staff_index)} members holding goal roles.")
+
+    def log_channel_for(self, state: GuildState, guild: discord.Guild):
+        if state.config.log_channel_id is None:
+            return None
+        return guild.get_channel(state.config.log_channel_id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.warm_task is not None:
+            await self.warm_task
+            self.warm_task = None
+        for state in list(self.guild_states.values()):
+            guild = self.bot.get_guild(state.guild_id)
+            if guild:
+                self.seed_staff_index(state, guild)
+        await self.open_known_guilds()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        state = self.guild_states.pop(guild.id, None)
+        if state is None: return
+        for guild_id, user_id in [key for key in self.afk_views if key[0] == guild.id]:
+            self.detach_afk_view(guild_id, user_id)
+        await state.close()
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        state = self.guild_states.get(member.guild.id)
+        if state and not member.bot:
+            state.staff_index.update(member.id, [role.id for role in member.roles])
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        state = self.guild_states.get(after.guild.id)
+        if state and not after.bot and before.roles != after.roles:
+            state.staff_index.update(after.id, [role.id for role in after.roles])
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        state = self.guild_states.get(member.guild.id)
+        if state:
+            state.staff_index.remove(member.id)
 
     @tasks.loop(hours=1)
+    @timed(LOOP_SECONDS, loop="check_staff_quotas")
     async def check_staff_quotas(self):
-        log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
-        if not log_channel: return
+        await self.for_each_guild(self.check_guild_quotas)
 
-        guild = log_channel.guild
-        data = get_data()
-        if "last_quota_notification" not in data:
-            data["last_quota_notification"] = {}
+    async def check_guild_quotas(self, state: GuildState):
+        config = state.config
+        guild = self.bot.get_guild(state.guild_id)
+        if not guild: return
+        log_channel = self.log_channel_for(state, guild)
+        if not log_channel: return
 
-        clocked_in_users = data.get("currently_clocked_in", {}).keys()
-        time_logs = data.get("time_logs", {})
-        last_notifications = data.get("last_quota_notification", {})
+        clocked_in_users = await state.storage.get_open_sessions()
+        last_notifications = await state.storage.get_quota_notifications()
         
-        target_role_ids = set(ROLE_GOALS.keys())
         members_to_notify = []
         now = datetime.datetime.now(datetime.timezone.utc)
+        window_totals = {}
+        for window in {config.goal_window(info) for info in config.role_goals.values()}:
+            bounds = window_bounds(window, config.quota_window_rolling, now.timestamp())
+            if bounds is not None:
+                window_totals[window] = await state.storage.get_window_totals(*bounds)
         
-        for member in guild.members:
-            if member.bot or str(member.id) in clocked_in_users: continue
-
-            member_role_ids = {role.id for role in member.roles}
-            if not target_role_ids.intersection(member_role_ids): continue
-            
-            last_notif_iso = last_notifications.get(str(member.id))
-            if last_notif_iso:
-                last_notif_time = datetime.datetime.fromisoformat(last_notif_iso)
-                if (now - last_notif_time).total_seconds() < NOTIFICATION_COOLDOWN_HOURS * 3600: continue
+        for user_id, member_role_ids in state.staff_index.items():
+            if user_id in clocked_in_users: continue
+            member = guild.get_member(user_id)
+            if not member: continue
             
-            total_seconds_worked = sum(log["duration_seconds"] for log in time_logs.get(str(member.id), []))
+            last_notif_ts = last_notifications.get(member.id)
+            if last_notif_ts is not None:
+                if now.timestamp() - last_notif_ts < NOTIFICATION_COOLDOWN_HOURS * 3600: continue
             
             unmet_quotas = []
-            for role_id, info in ROLE_GOALS.items():
-                if role_id in member_role_ids and total_seconds_worked < info["seconds"]:
-                    unmet_quotas.append(info)
+            for role_id, info in config.role_goals.items():
+                if role_id not in member_role_ids: continue
+                window = config.goal_window(info)
+                if window in window_totals:
+                    worked_seconds = window_totals[window].get(member.id, 0.0)
+                else:
+                    worked_seconds = state.leaderboard.total(member.id)
+                if worked_seconds < info["seconds"]:
+                    unmet_quotas.append((info, worked_seconds, window_label(window, config.quota_window_rolling)))
             
             if unmet_quotas:
-                members_to_notify.append((member, total_seconds_worked, unmet_quotas))
+                members_to_notify.append((member, unmet_quotas))
 
         if not members_to_notify: return
 
         log_embed = discord.Embed(title="📢 Activity Goal Reminder", description="The following team members have been notified:", color=discord.Color.orange(), timestamp=now)
-        notified_list_log = []
+        messages = []
 
-        for member, worked_seconds, quotas in members_to_notify:
+        for member, quotas in members_to_notify:
             dm_desc = "Hello! This is a friendly reminder about your voluntary activity goals:\n\n"
-            for quota_info in quotas:
+            for quota_info, worked_seconds, window_text in quotas:
                 worked_min = format_duration(worked_seconds, simple=True)
                 goal_min = format_duration(quota_info["seconds"], simple=True)
-                dm_desc += f"• **{quota_info['name']}**: `{worked_min} / {goal_min}` minutes\n"
+                dm_desc += f"• **{quota_info['name']}**: `{worked_min} / {goal_min}` minutes {window_text}\n"
             dm_desc += "\nUse the panel to **clock in** and continue contributing to the community."
 
             dm_embed = discord.Embed(title="👋 Activity Reminder", description=dm_desc, color=discord.Color.orange())
             dm_embed.set_footer(text=f"Server: {guild.name}")
-            
-            try:
-                await member.send(embed=dm_embed)
+            messages.append((member, {"embed": dm_embed}))
+
+        wave = await self.dm_dispatcher.send_wave(messages)
+        notified_list_log = []
+        for member, outcome in wave.outcomes:
+            if outcome == SENT:
                 notified_list_log.append(f"✅ {member.mention} (DM sent)")
-                data["last_quota_notification"][str(member.id)] = now.isoformat()
-            except discord.Forbidden:
+            elif outcome == BLOCKED:
                 notified_list_log.append(f"❌ {member.mention} (DMs blocked)")
+            else:
+                notified_list_log.append(f"⚠️ {member.mention} (DM failed)")
 
-        if notified_list_log:
-            log_embed.add_field(name="Notified Members", value="\n".join(notified_list_log), inline=False)
-            await log_channel.send(embed=log_embed)
-            save_data(data)
+        await state.storage.set_quota_notifications({member.id: int(now.timestamp()) for member in wave.sent})
+        log_embed.add_field(name="Summary", value=wave.summary(), inline=False)
+        log_embed.add_field(name="Notified Members", value=join_limited(notified_list_log), inline=False)
+        await log_channel.send(embed=log_embed)
 
     @check_staff_quotas.before_loop
     async def before_check_quotas(self):
         await self.bot.wait_until_ready()
 
-    @tasks.loop(minutes=5)
-    async def check_afk_staff(self):
-        log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
-        if not log_channel: return
-        
-        guild = log_channel.guild
-        data = get_data()
+    @timed(LOOP_SECONDS, loop="send_afk_checks")
+    async def send_afk_checks(self, keys):
+        await self.bot.wait_until_ready()
+        grouped = self.group_by_guild(keys)
+        await self.for_each_guild(lambda state: self.send_guild_afk_checks(state, grouped[state]), grouped)
+
+    async def send_guild_afk_checks(self, state: GuildState, user_ids):
         now = datetime.datetime.now(datetime.timezone.utc)
-        
-        for user_id, start_iso in data.get("currently_clocked_in", {}).copy().items():
-            if user_id in data.get("afk_check_sent", {}): continue
+        retry_at = now.timestamp() + AFK_RETRY_MINUTES * 60
+        guild = self.bot.get_guild(state.guild_id)
+        if not guild:
+            for user_id in user_ids:
+                self.afk_scheduler.schedule((state.guild_id, user_id), retry_at)
+            return
 
-            start_time = datetime.datetime.fromisoformat(start_iso)
-            duration = now - start_time
-            
-            if duration.total_seconds() > AFK_CHECK_HOURS * 3600:
-                member = guild.get_member(int(user_id))
-                if not member: continue
-
-                dm_embed = discord.Embed(
-                    title="🤔 Activity Check",
-                    description="Hello! Your activity log has been active for over 3 hours. Are you still there?",
-                    color=discord.Color.yellow()
-                )
-                try:
-                    view = AFKCheckView(member, self.bot)
-                    await member.send(embed=dm_embed, view=view)
-                    
-                    data["afk_check_sent"][user_id] = True
-                    save_data(data)
-                except discord.Forbidden:
-                    print(f"Could not send AFK check to {member.name} (DMs are closed).")
-
-    @check_afk_staff.before_loop
-    async def before_check_afk(self):
+        dm_embed = discord.Embed(
+            title="🤔 Activity Check",
+            description=f"Hello! Your activity log has been active for over {AFK_CHECK_HOURS} hours. Are you still there?",
+            color=discord.Color.yellow()
+        )
+        messages = []
+        for user_id in user_ids:
+            if await state.storage.get_open_session(user_id) is None: continue
+
+            member = guild.get_member(user_id)
+            if not member:
+                self.afk_scheduler.schedule((state.guild_id, user_id), retry_at)
+                continue
+            messages.append((member, {"embed": dm_embed, "view": AFKCheckView(state.guild_id, user_id, self)}))
+
+        views = {member.id: kwargs["view"] for member, kwargs in messages}
+        deadlines = {}
+
+        def on_sent(member):
+            # Armed per DM, so a member who answers while the rest of the wave is still sending is heard.
+            deadline = int(time.time()) + AFK_RESPONSE_MINUTES * 60
+            deadlines[member.id] = deadline
+            self.attach_afk_view(state.guild_id, member.id, deadline, views[member.id])
+
+        wave = await self.dm_dispatcher.send_wave(messages, on_sent)
+        for member, outcome in wave.outcomes:
+            if outcome != SENT:
+                logging.warning(f"Could not send AFK check to {member.name} ({outcome}).")
+                self.afk_scheduler.schedule((state.guild_id, member.id), retry_at)
+        async with state.storage.lock:
+            open_sessions = await state.storage.get_open_sessions()
+            pending = {}
+            for user_id, deadline in deadlines.items():
+                if user_id not in open_sessions:
+                    # Clocked out while the DM was being sent.
+                    self.detach_afk_view(state.guild_id, user_id)
+                elif (state.guild_id, user_id) in self.afk_response_scheduler:
+                    pending[user_id] = deadline
+            # Checks already answered during the wave are not stored at all.
+            if pending:
+                await state.storage.mark_afk_checks(pending)
+
+    @timed(LOOP_SECONDS, loop="expire_afk_checks")
+    async def expire_afk_checks(self, keys):
+        await self.bot.wait_until_ready()
+        grouped = self.group_by_guild(keys)
+        await self.for_each_guild(lambda state: self.expire_guild_afk_checks(state, grouped[state]), grouped)
+
+    async def expire_guild_afk_checks(self, state: GuildState, user_ids):
+        guild = self.bot.get_guild(state.guild_id)
+        log_channel = self.log_channel_for(state, guild) if guild else None
+        ping_text = f" <@&{state.config.afk_ping_role_id}>" if state.config.afk_ping_role_id else ""
+        for user_id in user_ids:
+            view = self.detach_afk_view(state.guild_id, user_id)
+            end_ts = int(time.time())
+            if view is not None and view.deadline:
+                # The member is not credited for time past the deadline, e.g. while the bot was down.
+                end_ts = min(end_ts, view.deadline)
+            end_time = datetime.datetime.fromtimestamp(end_ts, datetime.timezone.utc)
+            session = await self.close_session(state, user_id, end_ts, reason="afk_stop")
+            if session is None or not log_channel: continue
+
+            log_embed = discord.Embed(
+                title="🚨 Activity Stopped Due to Inactivity (AFK)",
+                description=f"The activity of <@{user_id}> was automatically stopped due to no response to the check.\n\n"
+                            f"**Possible AFK.**{ping_text}",
+                color=discord.Color.red(),
+                timestamp=end_time
+            )
+            await log_channel.send(embed=log_embed)
+
+    async def export_report(self, state: GuildState, writer: ReportWriter, since: Optional[int] = None, until: Optional[int] = None, user_ids=None):
+        loop = asyncio.get_running_loop()
+        # Sessions closed while the export runs are left out rather than appearing halfway through.
+        query_until = until if until is not None else int(time.time()) + 1
+        part = 0
+        async for batch in state.storage.iterate(state.storage.sync.iter_history, since, query_until, batch_size=REPORT_BATCH_ROWS):
+            for data in await loop.run_in_executor(None, writer.write, filter_sessions(batch, user_ids)):
+                part += 1
+                yield report_filename(writer.fmt, since, until, part), data
+        data = await loop.run_in_executor(None, writer.close)
+        if data is not None:
+            yield report_filename(writer.fmt, since, until, part + 1), data
+
+    @timed(LOOP_SECONDS, loop="refresh_live_panels")
+    async def refresh_live_panels(self, guild_ids):
+        await self.bot.wait_until_ready()
+        states = [self.guild_states[guild_id] for guild_id in guild_ids if guild_id in self.guild_states]
+        await self.for_each_guild(self.refresh_live_panel, states)
+
+    async def refresh_live_panel(self, state: GuildState):
+        config = state.config
+        guild = self.bot.get_guild(state.guild_id)
+        channel = guild.get_channel(config.live_panel_channel_id) if guild and config.live_panel_channel_id else None
+        if channel is None or config.live_panel_message_id is None: return
+        try:
+            await channel.get_partial_message(config.live_panel_message_id).edit(embed=await self.live_panel_embed(state))
+        except (discord.NotFound, discord.Forbidden) as e:
+            reason = "was deleted" if isinstance(e, discord.NotFound) else "can no longer be edited by the bot"
+            logging.warning(f"Live panel message of guild {state.guild_id} {reason}; turning the live panel off.")
+            config = config.copy()
+            config.live_panel_channel_id = config.live_panel_message_id = None
+            async with state.storage.lock:
+                await state.set_config(config)
+            return
+        LIVE_PANEL_EDITS.inc()
+
+    async def delete_live_panel_message(self, guild: discord.Guild, config: GuildConfig):
+        channel = guild.get_channel(config.live_panel_channel_id) if config.live_panel_channel_id else None
+        if channel is None or config.live_panel_message_id is None: return
+        try:
+            await channel.get_partial_message(config.live_panel_message_id).delete()
+        except (discord.NotFound, discord.Forbidden):
+            pass
+
+    @tasks.loop(seconds=5)
+    @timed(LOOP_SECONDS, loop="maintain_storage")
+    async def maintain_storage(self):
+        await self.for_each_guild(self.maintain_guild_storage)
+
+    async def maintain_guild_storage(self, state: GuildState):
+        await state.storage.maintain()
+        for name, size in (await state.storage.file_sizes()).items():
+            STORAGE_BYTES.labels(file=f"{state.guild_id}/{name}").set(size)
+
+    @tasks.loop(hours=6)
+    @timed(LOOP_SECONDS, loop="archive_old_sessions")
+    async def archive_old_sessions(self):
+        if ARCHIVE_AFTER_DAYS is None: return
+        before = month_start(time.time() - ARCHIVE_AFTER_DAYS * 86400)
+        await self.for_each_guild(lambda state: self.archive_guild_sessions(state, before))
+
+    async def archive_guild_sessions(self, state: GuildState, before: int):
+        moved = 0
+        # One month per storage call, so clock-ins never queue behind more than a month of rows.
+        # Exports in progress read the live store, so archiving waits for them to finish.
+        while not state.storage.iterating:
+            count = await state.storage.archive_sessions(before)
+            if not count: break
+            moved += count
+        if moved:
+            cutoff = datetime.datetime.fromtimestamp(before, datetime.timezone.utc).date()
+            logging.info(f"Archived {moved} sessions of guild {state.guild_id} that ended before {cutoff}.")
+
+    @archive_old_sessions.before_loop
+    async def before_archive_old_sessions(self):
         await self.bot.wait_until_ready()
 
     @app_commands.command(name="viewactivity", description="Views the activity information of a staff member.")
+    @app_commands.guild_only()
     @app_commands.describe(member="The member you want to check.")
-    @app.commands.checks.has_permissions(manage_guild=True)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("viewactivity")
     async def view_activity(self, interaction: discord.Interaction, member: discord.Member):
         await interaction.response.defer(ephemeral=True)
-        
-        user_id = str(member.id)
-        data = get_data()
-        user_logs = data["time_logs"].get(user_id, [])
-
-        if not user_logs:
+        state = await self.open_guild(interaction.guild)
+        card = await self.activity_card(state, member)
+        if card is None:
             await interaction.followup.send(f"{member.mention} does not have any activity records yet.")
             return
+        embed = activity_embed(card, f"Activity Time for {member.display_name}", member, "This member does not have a role with an activity goal.")
+        await interaction.followup.send(embed=embed)
 
-        total_seconds_worked = sum(log["duration_seconds"] for log in user_logs)
+    @app_commands.command(name="leaderboard", description="Shows the full staff activity ranking.")
+    @app_commands.guild_only()
+    @app_commands.describe(period="The period to rank by.", role="Only rank members with this role.")
+    @app_commands.choices(period=[
+        app_commands.Choice(name="All time", value="all"),
+        app_commands.Choice(name="This week", value="week"),
+        app_commands.Choice(name="This month", value="month")
+    ])
+    @timed_interaction("leaderboard")
+    async def show_leaderboard(self, interaction: discord.Interaction, period: Optional[app_commands.Choice[str]] = None, role: Optional[discord.Role] = None):
+        state = await self.open_guild(interaction.guild)
+        period_value = period.value if period else "all"
+        predicate = None
+        if role is not None:
+            role_member_ids = {member.id for member in role.members}
+            predicate = role_member_ids.__contains__
 
-        embed = discord.Embed(title=f"Activity Time for {member.display_name}", color=discord.Color.blue())
-        embed.set_thumbnail(url=member.display_avatar.url)
-        embed.add_field(name="Total Dedicated Time", value=f"**{format_duration(total_seconds_worked)}**", inline=False)
+        bounds = window_bounds(LEADERBOARD_PERIODS[period_value], False, time.time())
+        if bounds is None and predicate is None:
+            fetch_page = lambda offset, limit: state.leaderboard.top(limit, offset)
+            total_entries = len(state.leaderboard)
+        else:
+            if bounds is None:
+                entries = list(state.leaderboard.iter_ranking(predicate))
+            else:
+                entries = rank_totals(await state.storage.get_window_totals(*bounds), predicate)
+            fetch_page = lambda offset, limit: entries[offset:offset + limit]
+            total_entries = len(entries)
 
-        goals_text = ""
-        user_role_ids = [role.id for role in member.roles]
-        for role_id, info in ROLE_GOALS.items():
-            if role_id in user_role_ids:
-                goal_seconds = info["seconds"]
-                progress_percent = (total_seconds_worked / goal_seconds) * 100 if goal_seconds > 0 else 100
-                time_worked_str = format_duration(total_seconds_worked)
-                goal_time_str = format_duration(goal_seconds)
-                goals_text += f"<@&{role_id}>: `{time_worked_str} / {goal_time_str}` **({progress_percent:.1f}%)**\n"
-
-        if not goals_text:
-            goals_text = "This member does not have a role with an activity goal."
-        embed.add_field(name="Activity Goals", value=goals_text, inline=False)
+        title = "Staff Ranking"
+        if period:
+            title += f" • {period.name}"
+        if role:
+            title += f" • {role.name}"
+        view = LeaderboardView(title, fetch_page, total_entries)
+        await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
 
-        recent_sessions_text = ""
-        for log in reversed(user_logs[-5:]):
-            start_ts = int(datetime.datetime.fromisoformat(log["start"]).timestamp())
-            duration_str = format_duration(log["duration_seconds"])
-            recent_sessions_text += f"• <t:{start_ts}:d> - Duration: `{duration_str}`\n"
-        if recent_sessions_text:
-            embed.add_field(name="Recent Sessions", value=recent_sessions_text, inline=False)
+    @app_commands.command(name="activityreport", description="Exports raw session history as compressed CSV or NDJSON files.")
+    @app_commands.guild_only()
+    @app_commands.describe(
+        file_format="The file format (CSV by default).",
+        start="First day to include, as YYYY-MM-DD (UTC).",
+        end="Last day to include, as YYYY-MM-DD (UTC).",
+        member="Only include this member.",
+        role="Only include members with this role."
+    )
+    @app_commands.rename(file_format="format")
+    @app_commands.choices(file_format=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="NDJSON", value="ndjson")
+    ])
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityreport")
+    async def activity_report(self, interaction: discord.Interaction, file_format: Optional[app_commands.Choice[str]] = None, start: Optional[str] = None, end: Optional[str] = None, member: Optional[discord.Member] = None, role: Optional[discord.Role] = None):
+        await interaction.response.defer(ephemeral=True)
+        try:
+            since, until = report_range(start, end)
+        except ValueError:
+            await interaction.followup.send("❌ Dates must use the YYYY-MM-DD format and the end cannot be before the start.")
+            return
 
-        await interaction.followup.send(embed=embed)
+        user_ids = None
+        if member is not None:
+            user_ids = {member.id}
+        if role is not None:
+            role_member_ids = {role_member.id for role_member in role.members}
+            user_ids = role_member_ids if user_ids is None else user_ids & role_member_ids
+
+        state = await self.open_guild(interaction.guild)
+        writer = ReportWriter(file_format.value if file_format else "csv", REPORT_PART_BYTES)
+        part_count = 0
+        async for filename, data in self.export_report(state, writer, since, until, user_ids):
+            part_count += 1
+            await interaction.followup.send(file=discord.File(io.BytesIO(data), filename=filename))
+
+        if not part_count:
+            await interaction.followup.send("No sessions match those filters.")
+            return
+        await interaction.followup.send(f"✅ Exported {writer.rows} sessions in {part_count} file(s).")
 
     @app_commands.command(name="activitypanel", description="Creates the team activity panel in the current channel.")
+    @app_commands.guild_only()
     @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activitypanel")
     async def create_activity_panel(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         embed = discord.Embed(
@@ -384,9 +1006,124 @@ class ActivityCog(commands.Cog):
         )
         embed.set_image(url=IMAGE_URL)
         embed.set_footer(text="© Your Server Name. All rights reserved.")
-        await interaction.channel.send(embed=embed, view=ActivityPanelView())
+        view = ActivityPanelView(self)
+        self.panel_message_views.append(view)
+        await interaction.channel.send(embed=embed, view=view)
         await interaction.followup.send("✅ Activity panel created successfully!", ephemeral=True)
 
+    def config_embed(self, state: GuildState) -> discord.Embed:
+        config = state.config
+        embed = discord.Embed(title="Activity Settings", color=discord.Color.blue())
+        embed.add_field(name="Log Channel", value=f"<#{config.log_channel_id}>" if config.log_channel_id else "Not set (goal reminders and AFK logs are off)", inline=False)
+        embed.add_field(name="AFK Ping Role", value=f"<@&{config.afk_ping_role_id}>" if config.afk_ping_role_id else "None", inline=False)
+        embed.add_field(name="Goal Window", value=window_label(config.quota_window, config.quota_window_rolling), inline=False)
+        live_panel = f"https://discord.com/channels/{state.guild_id}/{config.live_panel_channel_id}/{config.live_panel_message_id}" if config.live_panel_message_id else "Off"
+        embed.add_field(name="Live Panel", value=live_panel, inline=False)
+        goal_lines = [
+            f"<@&{role_id}>: `{format_duration(info['seconds'])}` {window_label(config.goal_window(info), config.quota_window_rolling)}"
+            for role_id, info in config.role_goals.items()
+        ]
+        embed.add_field(name="Role Goals", value=join_limited(goal_lines) or "No goals configured.", inline=False)
+        return embed
+
+    async def update_config(self, interaction: discord.Interaction, state: GuildState, config: GuildConfig, message: str):
+        async with state.storage.lock:
+            await state.set_config(config)
+        self.seed_staff_index(state, interaction.guild)
+        await interaction.response.send_message(message, embed=self.config_embed(state), ephemeral=True)
+
+    @activity_config.command(name="show", description="Shows this server's activity settings.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_show(self, interaction: discord.Interaction):
+        state = await self.open_guild(interaction.guild)
+        await interaction.response.send_message(embed=self.config_embed(state), ephemeral=True)
+
+    @activity_config.command(name="logchannel", description="Sets the channel for goal reminders and AFK logs.")
+    @app_commands.describe(channel="The log channel.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_log_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        state = await self.open_guild(interaction.guild)
+        config = state.config.copy()
+        config.log_channel_id = channel.id
+        await self.update_config(interaction, state, config, f"✅ Activity logs will be sent to {channel.mention}.")
+
+    @activity_config.command(name="afkrole", description="Sets the role mentioned when someone is stopped for being AFK.")
+    @app_commands.describe(role="The role to mention. Leave empty to mention nobody.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_afk_role(self, interaction: discord.Interaction, role: Optional[discord.Role] = None):
+        state = await self.open_guild(interaction.guild)
+        config = state.config.copy()
+        config.afk_ping_role_id = role.id if role else None
+        await self.update_config(interaction, state, config, "✅ AFK ping role updated.")
+
+    @activity_config.command(name="livepanel", description="Posts a message listing who is clocked in, kept up to date automatically.")
+    @app_commands.describe(channel="Where to post it. Leave empty to stop updating the current one.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_live_panel(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
+        state = await self.open_guild(interaction.guild)
+        previous = state.config
+        config = previous.copy()
+        if channel is None:
+            config.live_panel_channel_id = config.live_panel_message_id = None
+            self.live_panel_scheduler.cancel(state.guild_id)
+            await self.delete_live_panel_message(interaction.guild, previous)
+            await self.update_config(interaction, state, config, "✅ Live panel turned off.")
+            return
+        try:
+            message = await channel.send(embed=await self.live_panel_embed(state))
+        except discord.Forbidden:
+            await interaction.response.send_message(f"❌ I can't send messages in {channel.mention}.", ephemeral=True)
+            return
+        # The old message would otherwise stay up with a frozen list.
+        await self.delete_live_panel_message(interaction.guild, previous)
+        config.live_panel_channel_id = channel.id
+        config.live_panel_message_id = message.id
+        await self.update_config(interaction, state, config, f"✅ Live panel posted in {channel.mention}.")
+
+    @activity_config.command(name="goal", description="Sets the activity goal for a role.")
+    @app_commands.describe(role="The role the goal applies to.", minutes="Minutes of activity expected per window.", window="Overrides the server's goal window for this role.")
+    @app_commands.choices(window=WINDOW_CHOICES)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_goal(self, interaction: discord.Interaction, role: discord.Role, minutes: app_commands.Range[int, 1, 44640], window: Optional[app_commands.Choice[str]] = None):
+        state = await self.open_guild(interaction.guild)
+        config = state.config.copy()
+        info = {"name": role.name, "seconds": minutes * 60}
+        if window:
+            info["window"] = window.value
+        config.role_goals[role.id] = info
+        await self.update_config(interaction, state, config, f"✅ Goal for {role.mention} set to {minutes} minutes.")
+
+    @activity_config.command(name="removegoal", description="Removes the activity goal of a role.")
+    @app_commands.describe(role="The role whose goal should be removed.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_remove_goal(self, interaction: discord.Interaction, role: discord.Role):
+        state = await self.open_guild(interaction.guild)
+        if role.id not in state.config.role_goals:
+            await interaction.response.send_message(f"❌ {role.mention} does not have an activity goal.", ephemeral=True)
+            return
+        config = state.config.copy()
+        del config.role_goals[role.id]
+        await self.update_config(interaction, state, config, f"✅ Goal for {role.mention} removed.")
+
+    @activity_config.command(name="window", description="Sets the default period activity goals are measured over.")
+    @app_commands.describe(window="The goal window.", rolling="Use the last 1/7/30 days instead of the calendar day/week/month (UTC).")
+    @app_commands.choices(window=WINDOW_CHOICES)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @timed_interaction("activityconfig")
+    async def config_window(self, interaction: discord.Interaction, window: app_commands.Choice[str], rolling: Optional[bool] = None):
+        state = await self.open_guild(interaction.guild)
+        config = state.config.copy()
+        config.quota_window = window.value
+        if rolling is not None:
+            config.quota_window_rolling = rolling
+        await self.update_config(interaction, state, config, "✅ Goal window updated.")
+
 
-async def setup(bot: commands.eBot):
+async def setup(bot: commands.Bot):
     await bot.add_cog(ActivityCog(bot))
\ No newline at end of file
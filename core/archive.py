@@ -0,0 +1,91 @@
+import datetime
+import gzip
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.models import Session
+
+ARCHIVE_DIR = "archive"
+MONTH_FILE = re.compile(r"^sessions-(\d{4})-(\d{2})\.ndjson\.gz$")
+
+
+def month_start(timestamp: float) -> int:
+    """Epoch second of the first UTC midnight of the month containing `timestamp`."""
+    date = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+    return int(datetime.datetime(date.year, date.month, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def next_month(month: int) -> int:
+    date = datetime.datetime.fromtimestamp(month, datetime.timezone.utc)
+    year, index = divmod(date.year * 12 + date.month, 12)
+    return int(datetime.datetime(year, index + 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+
+class SessionArchive:
+    """Closed sessions moved out of a live store, one gzip-compressed NDJSON file per UTC month.
+
+    Sessions are filed under the month their `end` falls in, one
+    `[user_id, start, end, duration]` line each, ordered by end time.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def month_path(self, month: int) -> str:
+        date = datetime.datetime.fromtimestamp(month, datetime.timezone.utc)
+        return os.path.join(self.directory, f"sessions-{date.year:04d}-{date.month:02d}.ndjson.gz")
+
+    def months(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        months = []
+        for name in os.listdir(self.directory):
+            match = MONTH_FILE.match(name)
+            if match:
+                months.append(int(datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc).timestamp()))
+        return sorted(months)
+
+    def size(self) -> int:
+        return sum(os.path.getsize(self.month_path(month)) for month in self.months())
+
+    def read_month(self, month: int) -> Iterator[Tuple[int, Session]]:
+        path = self.month_path(month)
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                user_id, start, end, duration = json.loads(line)
+                yield user_id, Session(start, end, duration)
+
+    def iter_sessions(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Tuple[int, Session]]:
+        for month in self.months():
+            if (until is not None and month >= until) or (since is not None and next_month(month) <= since):
+                continue
+            for user_id, session in self.read_month(month):
+                if since is not None and session.end < since:
+                    continue
+                if until is not None and session.end >= until:
+                    continue
+                yield user_id, session
+
+    def add(self, month: int, rows: Iterable[Tuple[int, Session]]):
+        """Merges `rows` into the month's file, replacing it atomically.
+
+        Rows already archived are skipped, so retrying after a crash between
+        writing the archive and deleting the live rows is harmless.
+        """
+        merged: Dict[Tuple[int, int, int], Tuple[int, Session]] = {}
+        for user_id, session in list(self.read_month(month)) + list(rows):
+            merged.setdefault((user_id, session.start, session.end), (user_id, session))
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.month_path(month)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                for user_id, session in sorted(merged.values(), key=lambda row: row[1].end):
+                    f.write((json.dumps([user_id, *session], separators=(",", ":")) + "\n").encode())
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator
+
+from core.metrics import STORAGE_SECONDS
+from core.storage import Storage
+
+
+def next_batch(iterator: Iterator, size: int) -> list:
+    return list(itertools.islice(iterator, size))
+
+
+def close_iterator(iterator: Iterator):
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+
+class AsyncStorage:
+    """Awaitable front for a `Storage` backend.
+
+    Every call runs on one dedicated worker thread, so disk I/O and
+    serialization never block the event loop and the backend only ever sees
+    a single writer. `lock` serializes multi-step read-modify-write sequences
+    (clock out, then refresh the leaderboard) across concurrent interactions.
+    """
+
+    def __init__(self, storage: Storage, executor: ThreadPoolExecutor):
+        self.sync = storage
+        self.lock = asyncio.Lock()
+        self.iterating = 0
+        self._executor = executor
+
+    @classmethod
+    async def open(cls, factory: Callable[[], Storage]) -> "AsyncStorage":
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="timeclock-storage")
+        storage = await asyncio.get_running_loop().run_in_executor(executor, factory)
+        return cls(storage, executor)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            STORAGE_SECONDS.labels(op=getattr(func, "__name__", "call")).observe(time.perf_counter() - started)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.sync, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+        return call
+
+    async def iterate(self, func: Callable, *args, batch_size: int = 1000, **kwargs) -> AsyncIterator[list]:
+        """Drains a backend generator such as `iter_sessions` in batches, each pulled on the storage thread.
+
+        Other storage calls can interleave between batches, so a long export
+        never holds up clock-ins. `iterating` counts the drains in progress.
+        """
+        self.iterating += 1
+        try:
+            iterator = await self.run(func, *args, **kwargs)
+        except BaseException:
+            self.iterating -= 1
+            raise
+        try:
+            while True:
+                batch = await self.run(next_batch, iterator, batch_size)
+                if not batch:
+                    return
+                yield batch
+        finally:
+            self.iterating -= 1
+            await self.run(close_iterator, iterator)
+
+    async def close(self):
+        await self.run(self.sync.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional, Tuple
+
+CARD_CACHE_SIZE = 512
+
+
+class ActivityCard(NamedTuple):
+    """The text of a member's activity embed that only changes with their sessions, goal roles or goal windows."""
+    total: str
+    goals: Optional[str]
+    recent: Optional[str]
+
+
+class CardCache:
+    """LRU cache of rendered activity cards for one guild, at most one per user.
+
+    A card is only returned for the stamp it was rendered with: the user's
+    `version` plus whatever else went into it (their goal roles, the window
+    bounds). `invalidate` bumps the version, so a card rendered from data read
+    before a session closed is never served after it.
+    """
+
+    def __init__(self, maxsize: int = CARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cards: "OrderedDict[int, Tuple[Hashable, ActivityCard]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._cards)
+
+    def version(self, user_id: int) -> Tuple[int, int]:
+        return self._generation, self._versions.get(user_id, 0)
+
+    def get(self, user_id: int, stamp: Hashable) -> Optional[ActivityCard]:
+        entry = self._cards.get(user_id)
+        if entry is None or entry[0] != stamp:
+            return None
+        self._cards.move_to_end(user_id)
+        return entry[1]
+
+    def put(self, user_id: int, stamp: Hashable, card: ActivityCard):
+        self._cards[user_id] = (stamp, card)
+        self._cards.move_to_end(user_id)
+        if len(self._cards) > self.maxsize:
+            self._cards.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._cards.pop(user_id, None)
+
+    def clear(self):
+        """Drops every card, e.g. after the guild's goals changed."""
+        self._generation += 1
+        self._cards.clear()
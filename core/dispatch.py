@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from core.metrics import DM_RATE_LIMITED, DM_SENDS
+
+SENT = "sent"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+
+class WaveResult:
+    def __init__(self, outcomes: List[Tuple[Any, str]]):
+        self.outcomes = outcomes
+
+    def members(self, outcome: str) -> list:
+        return [member for member, result in self.outcomes if result == outcome]
+
+    @property
+    def sent(self) -> list:
+        return self.members(SENT)
+
+    @property
+    def blocked(self) -> list:
+        return self.members(BLOCKED)
+
+    @property
+    def failed(self) -> list:
+        return self.members(FAILED)
+
+    def summary(self) -> str:
+        return f"✅ {len(self.sent)} sent • ❌ {len(self.blocked)} blocked • ⚠️ {len(self.failed)} failed"
+
+
+class DMDispatcher:
+    """Sends DMs with bounded concurrency and a shared back-off on 429 responses.
+
+    discord.py already retries most rate limits internally; anything that
+    still surfaces as a 429 pauses every worker until `retry_after` has
+    passed instead of letting each one hammer the API on its own.
+    """
+
+    def __init__(self, concurrency: int = 8, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._resume_at = 0.0
+
+    def _pause(self, retry_after: float):
+        loop = asyncio.get_running_loop()
+        self._resume_at = max(self._resume_at, loop.time() + retry_after)
+
+    async def _wait_for_rate_limit(self):
+        delay = self._resume_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def send(self, member, **kwargs) -> str:
+        outcome = await self._send(member, **kwargs)
+        DM_SENDS.labels(outcome=outcome).inc()
+        return outcome
+
+    async def _send(self, member, **kwargs) -> str:
+        async with self._semaphore:
+            for attempt in range(1, self.max_attempts + 1):
+                await self._wait_for_rate_limit()
+                try:
+                    await member.send(**kwargs)
+                    return SENT
+                except discord.Forbidden:
+                    return BLOCKED
+                except discord.RateLimited as e:
+                    DM_RATE_LIMITED.inc()
+                    self._pause(e.retry_after)
+                except discord.HTTPException as e:
+                    if e.status == 429:
+                        DM_RATE_LIMITED.inc()
+                        self._pause(float(e.response.headers.get("Retry-After", 1)))
+                    elif e.status >= 500:
+                        await asyncio.sleep(attempt)
+                    else:
+                        logging.warning(f"Could not DM {member} ({e.status}): {e.text}")
+                        return FAILED
+            logging.warning(f"Giving up on DM to {member} after {self.max_attempts} attempts.")
+            return FAILED
+
+    async def send_wave(self, messages: Iterable[Tuple[Any, Dict[str, Any]]],
+                        on_sent: Optional[Callable[[Any], None]] = None) -> WaveResult:
+        """Sends every message concurrently; `on_sent(member)` runs as soon as that member's DM went out."""
+        async def send_one(member, kwargs):
+            outcome = await self.send(member, **kwargs)
+            if outcome == SENT and on_sent is not None:
+                on_sent(member)
+            return outcome
+
+        messages = list(messages)
+        results = await asyncio.gather(*(send_one(member, kwargs) for member, kwargs in messages))
+        return WaveResult([(member, result) for (member, _), result in zip(messages, results)])
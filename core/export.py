@@ -0,0 +1,131 @@
+import datetime
+import gzip
+import io
+import json
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from core.models import Session
+from core.rollups import DAY_SECONDS
+from core.storage import to_iso
+
+FORMATS = ("csv", "ndjson")
+CSV_HEADER = "user_id,start,end,duration_seconds\n"
+# Sync-flush the compressor after this much input so the compressed size is known before a part overflows.
+FLUSH_BYTES = 256 * 1024
+
+
+def parse_day(text: str) -> int:
+    """`YYYY-MM-DD` to the epoch second of that UTC midnight."""
+    date = datetime.date.fromisoformat(text)
+    return int(datetime.datetime(date.year, date.month, date.day, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def report_range(first_day: Optional[str] = None, last_day: Optional[str] = None) -> Tuple[Optional[int], Optional[int]]:
+    """Turns an inclusive range of `YYYY-MM-DD` days into `(since, until)` bounds on session end times."""
+    since = parse_day(first_day) if first_day else None
+    until = parse_day(last_day) + DAY_SECONDS if last_day else None
+    if since is not None and until is not None and until <= since:
+        raise ValueError("The end date must not be before the start date.")
+    return since, until
+
+
+def filter_sessions(rows: Iterable[Tuple[int, Session]], user_ids: Optional[Set[int]] = None) -> Iterator[Tuple[int, Session]]:
+    for user_id, session in rows:
+        if user_ids is None or user_id in user_ids:
+            yield user_id, session
+
+
+def format_csv(rows: Iterable[Tuple[int, Session]]) -> Iterator[str]:
+    for user_id, session in rows:
+        yield f"{user_id},{to_iso(session.start)},{to_iso(session.end)},{session.duration}\n"
+
+
+def format_ndjson(rows: Iterable[Tuple[int, Session]]) -> Iterator[str]:
+    for user_id, session in rows:
+        yield json.dumps({
+            "user_id": user_id,
+            "start": to_iso(session.start),
+            "end": to_iso(session.end),
+            "duration_seconds": session.duration
+        }, separators=(",", ":")) + "\n"
+
+
+class GzipParts:
+    """Packs text lines into standalone gzip files of at most `max_bytes` each.
+
+    Only the part being filled is held in memory. Every part starts with
+    `header`, so each one can be opened on its own.
+    """
+
+    def __init__(self, max_bytes: int, header: str = ""):
+        if max_bytes <= FLUSH_BYTES * 2:
+            raise ValueError(f"Parts must be larger than {FLUSH_BYTES * 2} bytes.")
+        self.max_bytes = max_bytes
+        self.header = header
+        self._buffer = None
+        self._gzip = None
+        self._unflushed = 0
+
+    def _open(self):
+        self._buffer = io.BytesIO()
+        self._gzip = gzip.GzipFile(fileobj=self._buffer, mode="wb", mtime=0)
+        self._unflushed = 0
+        if self.header:
+            self._write(self.header)
+
+    def _write(self, text: str):
+        data = text.encode()
+        self._gzip.write(data)
+        self._unflushed += len(data)
+
+    def _finish(self) -> bytes:
+        self._gzip.close()
+        data = self._buffer.getvalue()
+        self._buffer = self._gzip = None
+        return data
+
+    def write(self, lines: Iterable[str]) -> List[bytes]:
+        finished = []
+        for line in lines:
+            if self._gzip is None:
+                self._open()
+            self._write(line)
+            if self._unflushed >= FLUSH_BYTES:
+                self._gzip.flush()
+                self._unflushed = 0
+                # The next flush adds at most ~FLUSH_BYTES, since deflate never grows data by more than a few bytes per block.
+                if self._buffer.tell() + FLUSH_BYTES + 1024 > self.max_bytes:
+                    finished.append(self._finish())
+        return finished
+
+    def close(self) -> Optional[bytes]:
+        return self._finish() if self._gzip is not None else None
+
+
+class ReportWriter:
+    """Formats session rows as CSV or NDJSON and splits them into gzip parts."""
+
+    def __init__(self, fmt: str, max_bytes: int):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown report format: {fmt!r}")
+        self.fmt = fmt
+        self.rows = 0
+        self._format = format_csv if fmt == "csv" else format_ndjson
+        self._parts = GzipParts(max_bytes, CSV_HEADER if fmt == "csv" else "")
+
+    def _count(self, rows: Iterable[Tuple[int, Session]]) -> Iterator[Tuple[int, Session]]:
+        for row in rows:
+            self.rows += 1
+            yield row
+
+    def write(self, rows: Iterable[Tuple[int, Session]]) -> List[bytes]:
+        return self._parts.write(self._format(self._count(rows)))
+
+    def close(self) -> Optional[bytes]:
+        return self._parts.close()
+
+
+def report_filename(fmt: str, since: Optional[int], until: Optional[int], part: int) -> str:
+    first = datetime.datetime.fromtimestamp(since, datetime.timezone.utc).strftime("%Y%m%d") if since is not None else "start"
+    last = datetime.datetime.fromtimestamp(until - 1, datetime.timezone.utc).strftime("%Y%m%d") if until is not None else "now"
+    return f"activity_report_{first}-{last}_part{part:02d}.{fmt}.gz"
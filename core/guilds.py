@@ -0,0 +1,139 @@
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from core.async_storage import AsyncStorage
+from core.cards import CardCache
+from core.leaderboard import Leaderboard
+from core.staff_index import StaffIndex
+from core.storage import Storage
+
+# Files a store may leave next to its main path: SQLite WAL/SHM, the journal, a migrated legacy JSON file.
+STORE_SIDECARS = ("", "-wal", "-shm", ".journal", ".migrated")
+
+
+def partition_dir(path: str, guild_id: int) -> str:
+    return os.path.join(os.path.dirname(path), "guilds", str(guild_id))
+
+
+def stored_guild_ids(path: str) -> List[int]:
+    """Guilds that already have a partition next to `path`."""
+    root = os.path.join(os.path.dirname(path), "guilds")
+    if not os.path.isdir(root):
+        return []
+    return [int(name) for name in os.listdir(root) if name.isdigit() and os.path.isdir(os.path.join(root, name))]
+
+
+def partition_path(path: str, guild_id: int) -> str:
+    """Where `path` lives for one guild: `<dir>/guilds/<guild_id>/<name>`."""
+    return os.path.join(partition_dir(path, guild_id), os.path.basename(path))
+
+
+def adopt_legacy_files(path: str, guild_id: int) -> bool:
+    """Moves a pre-multi-guild store at `path` (and its sidecar files) into `guild_id`'s partition."""
+    target = partition_path(path, guild_id)
+    if not any(os.path.exists(path + suffix) for suffix in STORE_SIDECARS):
+        return False
+    if any(os.path.exists(target + suffix) for suffix in STORE_SIDECARS):
+        logging.warning(f"Not adopting '{path}' for guild {guild_id}: '{target}' already exists.")
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    for suffix in STORE_SIDECARS:
+        if os.path.exists(path + suffix):
+            os.replace(path + suffix, target + suffix)
+    logging.info(f"Moved single-guild data '{path}' into the partition of guild {guild_id}.")
+    return True
+
+
+class GuildConfig:
+    """Activity settings for one guild, persisted key by key in that guild's store."""
+
+    def __init__(self, log_channel_id: Optional[int] = None, afk_ping_role_id: Optional[int] = None,
+                 role_goals: Optional[Dict[int, dict]] = None, quota_window: str = "weekly", quota_window_rolling: bool = False,
+                 live_panel_channel_id: Optional[int] = None, live_panel_message_id: Optional[int] = None):
+        self.log_channel_id = log_channel_id
+        self.afk_ping_role_id = afk_ping_role_id
+        self.role_goals = dict(role_goals or {})
+        self.quota_window = quota_window
+        self.quota_window_rolling = quota_window_rolling
+        self.live_panel_channel_id = live_panel_channel_id
+        self.live_panel_message_id = live_panel_message_id
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, object], defaults: Optional["GuildConfig"] = None) -> "GuildConfig":
+        config = cls(**vars(defaults)) if defaults is not None else cls()
+        if "log_channel_id" in settings:
+            config.log_channel_id = settings["log_channel_id"]
+        if "afk_ping_role_id" in settings:
+            config.afk_ping_role_id = settings["afk_ping_role_id"]
+        if "role_goals" in settings:
+            config.role_goals = {int(role_id): info for role_id, info in settings["role_goals"].items()}
+        if "quota_window" in settings:
+            config.quota_window = settings["quota_window"]
+        if "quota_window_rolling" in settings:
+            config.quota_window_rolling = settings["quota_window_rolling"]
+        if "live_panel_channel_id" in settings:
+            config.live_panel_channel_id = settings["live_panel_channel_id"]
+        if "live_panel_message_id" in settings:
+            config.live_panel_message_id = settings["live_panel_message_id"]
+        return config
+
+    def to_settings(self) -> Dict[str, object]:
+        return {
+            "log_channel_id": self.log_channel_id,
+            "afk_ping_role_id": self.afk_ping_role_id,
+            "role_goals": {str(role_id): info for role_id, info in self.role_goals.items()},
+            "quota_window": self.quota_window,
+            "quota_window_rolling": self.quota_window_rolling,
+            "live_panel_channel_id": self.live_panel_channel_id,
+            "live_panel_message_id": self.live_panel_message_id
+        }
+
+    def copy(self) -> "GuildConfig":
+        return GuildConfig.from_settings(self.to_settings())
+
+    def goal_window(self, info: dict) -> str:
+        return info.get("window", self.quota_window)
+
+
+class GuildState:
+    """Everything the activity cog keeps for one guild.
+
+    Each guild has its own store, with its own worker thread and lock, so a
+    slow write or a long export in one guild never queues behind another.
+    """
+
+    def __init__(self, guild_id: int, storage: AsyncStorage, config: GuildConfig):
+        self.guild_id = guild_id
+        self.storage = storage
+        self.config = config
+        self.leaderboard = Leaderboard()
+        self.staff_index = StaffIndex(config.role_goals)
+        self.cards = CardCache()
+
+    @classmethod
+    async def open(cls, guild_id: int, factory: Callable[[], Storage], defaults: GuildConfig, seed: Optional[GuildConfig] = None) -> "GuildState":
+        """Opens the guild's store; `seed` is saved as its configuration if it has none yet."""
+        storage = await AsyncStorage.open(factory)
+        settings = await storage.get_settings()
+        if not settings and seed is not None:
+            for key, value in seed.to_settings().items():
+                await storage.set_setting(key, value)
+            settings = await storage.get_settings()
+        state = cls(guild_id, storage, GuildConfig.from_settings(settings, defaults))
+        state.leaderboard = Leaderboard(await storage.get_all_totals())
+        return state
+
+    async def set_config(self, config: GuildConfig):
+        previous = self.config.to_settings()
+        for key, value in config.to_settings().items():
+            if previous.get(key) != value:
+                await self.storage.set_setting(key, value)
+        self.config = config
+        self.cards.clear()
+        if self.staff_index.tracked_role_ids != frozenset(config.role_goals):
+            self.staff_index = StaffIndex(config.role_goals)
+
+    async def close(self):
+        async with self.storage.lock:
+            await self.storage.close()
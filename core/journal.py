@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.models import Session, SessionLog, UserTotals
+from core.rollups import DailyRollups
+from core.storage import LEGACY_AFK_DEADLINE, Storage, atomic_write_json, legacy_sessions, to_timestamp
+
+SYNC_INTERVAL_SECONDS = 1.0
+COMPACT_EVERY_EVENTS = 5000
+
+
+class JournalStorage(Storage):
+    """In-memory state backed by an append-only event journal and a periodic snapshot.
+
+    Every change is one JSON line appended to `<path>.journal`; `fsync` is
+    batched to at most once per `sync_interval`. On startup the snapshot is
+    loaded and the journal replayed on top of it. `compact()` folds the
+    journal into a fresh snapshot and truncates it.
+    """
+
+    def __init__(self, path: str, sync_interval: float = SYNC_INTERVAL_SECONDS, compact_every: int = COMPACT_EVERY_EVENTS):
+        self.path = path
+        self.snapshot_path = path
+        self.journal_path = path + ".journal"
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self._open: Dict[int, int] = {}
+        self._sessions: Dict[int, SessionLog] = {}
+        self._quota: Dict[int, int] = {}
+        self._afk: Dict[int, int] = {}
+        self._settings: Dict[str, object] = {}
+        self._totals: Dict[int, UserTotals] = {}
+        self._rollups = DailyRollups()
+        self._seq = 0
+        self._pending_events = 0
+        self._last_sync = time.monotonic()
+        self._dirty = False
+        self._recover()
+        self._journal = open(self.journal_path, "a")
+
+    def _recover(self):
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot["seq"]
+            self._open = {int(user_id): start for user_id, start in snapshot["open"].items()}
+            # Snapshots written before packed logs hold a list of [start, end, duration] rows per user.
+            self._sessions = {
+                int(user_id): SessionLog.from_text(log) if isinstance(log, str) else SessionLog.from_sessions(Session(*row) for row in log)
+                for user_id, log in snapshot["sessions"].items()
+            }
+            self._quota = {int(user_id): ts for user_id, ts in snapshot["quota"].items()}
+            self._afk = {int(user_id): ts for user_id, ts in snapshot["afk"].items()}
+            self._settings = snapshot.get("settings", {})
+            if "totals" in snapshot and "rollups" in snapshot:
+                self._totals = {int(user_id): UserTotals.from_row(row) for user_id, row in snapshot["totals"].items()}
+                self._rollups = DailyRollups.from_dict(snapshot["rollups"])
+            else:
+                self.rebuild_totals()
+        self._seq = snapshot_seq
+
+        if not os.path.exists(self.journal_path):
+            return
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    event = None
+                if event is None or not line.endswith(b"\n"):
+                    # A torn final line is the only thing a crash mid-append can leave behind;
+                    # cut it off so later appends are not stranded behind it.
+                    logging.warning(f"Truncating torn journal entry at byte {valid_bytes} of '{self.journal_path}'.")
+                    break
+                valid_bytes += len(line)
+                if event["seq"] <= snapshot_seq:
+                    continue
+                self._apply(event)
+                self._seq = event["seq"]
+                replayed += 1
+        if valid_bytes != os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        self._pending_events = replayed
+        if replayed:
+            logging.info(f"Replayed {replayed} journal events from '{self.journal_path}'.")
+
+    def _apply(self, event: dict):
+        op = event["op"]
+        user_id = event.get("u")
+        if op == "clock_in":
+            self._open[user_id] = event["s"]
+        elif op in ("clock_out", "afk_stop"):
+            self._open.pop(user_id, None)
+            self._afk.pop(user_id, None)
+            session = Session(event["s"], event["e"], event["d"])
+            self._sessions.setdefault(user_id, SessionLog()).append(session)
+            self._totals.setdefault(user_id, UserTotals()).add(session)
+            self._rollups.add(user_id, session)
+        elif op == "afk_check":
+            self._afk[user_id] = event["t"]
+        elif op == "afk_answered":
+            if user_id in self._afk:
+                self._afk[user_id] = 0
+        elif op == "quota_notified":
+            self._quota[user_id] = event["t"]
+        elif op == "archived":
+            for archived_user_id, log in list(self._sessions.items()):
+                kept = log.without_ended(event["f"], event["e"])
+                if kept:
+                    self._sessions[archived_user_id] = kept
+                else:
+                    del self._sessions[archived_user_id]
+        elif op == "setting":
+            if event["v"] is None:
+                self._settings.pop(event["k"], None)
+            else:
+                self._settings[event["k"]] = event["v"]
+
+    def _append(self, event: dict):
+        self._seq += 1
+        event["seq"] = self._seq
+        self._apply(event)
+        self._journal.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        self._pending_events += 1
+        self._dirty = True
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if not self._dirty:
+            return
+        os.fsync(self._journal.fileno())
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        self.sync()
+        atomic_write_json(self.snapshot_path, {
+            "seq": self._seq,
+            "open": self._open,
+            "sessions": {user_id: log.to_text() for user_id, log in self._sessions.items()},
+            "quota": self._quota,
+            "afk": self._afk,
+            "settings": self._settings,
+            "totals": {user_id: totals.to_row() for user_id, totals in self._totals.items()},
+            "rollups": self._rollups.to_dict()
+        }, separators=(",", ":"))
+        self._journal.close()
+        self._journal = open(self.journal_path, "w")
+        os.fsync(self._journal.fileno())
+        self._pending_events = 0
+
+    def maintain(self):
+        if self._pending_events >= self.compact_every:
+            self.compact()
+        else:
+            self.sync()
+
+    def close(self):
+        self.compact()
+        self._journal.close()
+
+    def file_paths(self) -> List[str]:
+        return [self.snapshot_path, self.journal_path]
+
+    def is_empty(self) -> bool:
+        return not self._sessions and not self._open
+
+    def import_legacy(self, document: dict):
+        for user_id, start in document.get("currently_clocked_in", {}).items():
+            self._open[int(user_id)] = to_timestamp(start)
+        for user_id, session in legacy_sessions(document):
+            self._sessions.setdefault(user_id, SessionLog()).append(session)
+        for user_id, ts in document.get("last_quota_notification", {}).items():
+            self._quota[int(user_id)] = to_timestamp(ts)
+        for user_id, sent in document.get("afk_check_sent", {}).items():
+            if sent:
+                self._afk[int(user_id)] = LEGACY_AFK_DEADLINE
+        self.rebuild_totals()
+        self.compact()
+
+    def get_open_sessions(self) -> Dict[int, int]:
+        return dict(self._open)
+
+    def get_open_session(self, user_id: int) -> Optional[int]:
+        return self._open.get(user_id)
+
+    def clock_in(self, user_id: int, start: int) -> bool:
+        if user_id in self._open:
+            return False
+        self._append({"op": "clock_in", "u": user_id, "s": start})
+        return True
+
+    def clock_out(self, user_id: int, end: int, reason: str = "clock_out") -> Optional[Session]:
+        start = self._open.get(user_id)
+        if start is None:
+            return None
+        session = Session(start, end, float(end - start))
+        self._append({"op": reason, "u": user_id, "s": session.start, "e": session.end, "d": session.duration})
+        return session
+
+    def iter_sessions(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Tuple[int, Session]]:
+        for user_id, log in list(self._sessions.items()):
+            for session in log:
+                if since is not None and session.end < since:
+                    continue
+                if until is not None and session.end >= until:
+                    continue
+                yield user_id, session
+
+    def get_user_totals(self, user_id: int) -> UserTotals:
+        return self._totals.get(user_id) or UserTotals()
+
+    def rebuild_totals(self):
+        self._totals = self.history_totals()
+        self._rollups = DailyRollups.from_sessions(self.iter_history())
+
+    def forget_sessions(self, since: int, until: int):
+        self._append({"op": "archived", "f": since, "e": until})
+        # Archiving exists to shrink the store, so fold the removal into the snapshot right away.
+        self.compact()
+
+    def get_window_total(self, user_id: int, first_day: int, end_day: int) -> float:
+        return self._rollups.total(user_id, first_day, end_day)
+
+    def get_window_totals(self, first_day: int, end_day: int) -> Dict[int, float]:
+        return self._rollups.totals(first_day, end_day)
+
+    def get_all_totals(self) -> Dict[int, float]:
+        return {user_id: totals.total_seconds for user_id, totals in self._totals.items()}
+
+    def get_quota_notifications(self) -> Dict[int, int]:
+        return dict(self._quota)
+
+    def set_quota_notifications(self, notified: Dict[int, int]):
+        for user_id, ts in notified.items():
+            self._append({"op": "quota_notified", "u": user_id, "t": ts})
+
+    def get_afk_checks(self) -> Dict[int, int]:
+        return dict(self._afk)
+
+    def mark_afk_checks(self, deadlines: Dict[int, int]):
+        for user_id, deadline in deadlines.items():
+            self._append({"op": "afk_check", "u": user_id, "t": deadline})
+
+    def resolve_afk_check(self, user_id: int):
+        self._append({"op": "afk_answered", "u": user_id})
+
+    def get_settings(self) -> Dict[str, object]:
+        return dict(self._settings)
+
+    def set_setting(self, key: str, value):
+        self._append({"op": "setting", "k": key, "v": value})
@@ -0,0 +1,72 @@
+import bisect
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+
+class _BisectList:
+    """Minimal stand-in for `sortedcontainers.SortedList` when it is not installed."""
+
+    def __init__(self, iterable=()):
+        self._items = sorted(iterable)
+
+    def add(self, value):
+        bisect.insort(self._items, value)
+
+    def remove(self, value):
+        index = bisect.bisect_left(self._items, value)
+        if index == len(self._items) or self._items[index] != value:
+            raise ValueError(value)
+        del self._items[index]
+
+    def islice(self, start: int, stop: Optional[int] = None) -> Iterator:
+        return iter(self._items[start:stop])
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Leaderboard:
+    """All-time ranking kept ordered by total seconds, highest first.
+
+    Entries are stored as `(-total_seconds, user_id)` so ties rank by user id
+    and the natural sort order is the ranking order.
+    """
+
+    def __init__(self, totals: Optional[Dict[int, float]] = None):
+        self._totals: Dict[int, float] = dict(totals or {})
+        entries = ((-total, user_id) for user_id, total in self._totals.items())
+        self._ranking = SortedList(entries) if SortedList is not None else _BisectList(entries)
+
+    def __len__(self):
+        return len(self._totals)
+
+    def update(self, user_id: int, total_seconds: float):
+        previous = self._totals.get(user_id)
+        if previous is not None:
+            self._ranking.remove((-previous, user_id))
+        self._totals[user_id] = total_seconds
+        self._ranking.add((-total_seconds, user_id))
+
+    def total(self, user_id: int) -> float:
+        return self._totals.get(user_id, 0.0)
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+        return [(user_id, -total) for total, user_id in self._ranking.islice(offset, offset + limit)]
+
+    def iter_ranking(self, predicate: Optional[Callable[[int], bool]] = None) -> Iterator[Tuple[int, float]]:
+        for total, user_id in self._ranking:
+            if predicate is None or predicate(user_id):
+                yield user_id, -total
+
+
+def rank_totals(totals: Dict[int, float], predicate: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+    entries = [(user_id, total) for user_id, total in totals.items() if predicate is None or predicate(user_id)]
+    entries.sort(key=lambda item: (-item[1], item[0]))
+    return entries
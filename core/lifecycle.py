@@ -0,0 +1,55 @@
+import asyncio
+import contextlib
+from typing import Dict, Optional
+
+
+class InFlight:
+    """Counts running callbacks so a reload or shutdown can wait for them to finish."""
+
+    def __init__(self):
+        self.count = 0
+        self._idle: Optional[asyncio.Event] = None
+
+    @contextlib.contextmanager
+    def track(self):
+        self.count += 1
+        try:
+            yield
+        finally:
+            self.count -= 1
+            if not self.count and self._idle is not None:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Waits until nothing is running; False if `timeout` passed first."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Re-checked after every wakeup: another call may have started before this task resumed.
+        while self.count:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            if self._idle is None:
+                self._idle = asyncio.Event()
+            self._idle.clear()
+            try:
+                await asyncio.wait_for(self._idle.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+INTERACTIONS = InFlight()
+BACKGROUND = InFlight()
+
+# Lives here rather than in a cog module because `reload_extension` re-imports the cog
+# but not `core`, so whatever the old cog instance leaves behind survives the reload.
+_handoffs: Dict[str, dict] = {}
+
+
+def put_handoff(name: str, state: dict):
+    _handoffs[name] = state
+
+
+def take_handoff(name: str) -> Optional[dict]:
+    return _handoffs.pop(name, None)
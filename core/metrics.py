@@ -0,0 +1,300 @@
+import asyncio
+import bisect
+import functools
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.lifecycle import BACKGROUND, INTERACTIONS
+
+# Prometheus' default buckets plus 2.5/3 s around Discord's interaction ack deadline.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 2.5, 3.0, 5.0, 10.0)
+ACK_DEADLINE_SECONDS = 3.0
+
+
+def format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return math.nan
+        return self._value
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile by interpolating inside its bucket, like PromQL's `histogram_quantile`."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        lower_bound, lower_count = 0.0, 0
+        for bound, cumulative in self.cumulative():
+            if cumulative >= rank:
+                if math.isinf(bound):
+                    return self.max
+                in_bucket = cumulative - lower_count
+                fraction = (rank - lower_count) / in_bucket if in_bucket else 1.0
+                return min(self.max, lower_bound + (bound - lower_bound) * fraction)
+            lower_bound, lower_count = bound, cumulative
+        return self.max
+
+    def count_over(self, threshold: float) -> int:
+        """Observations in the buckets above `threshold`; exact when `threshold` is a bucket bound."""
+        index = bisect.bisect_right(self.buckets, threshold)
+        return sum(self.counts[index:])
+
+
+class MetricFamily:
+    """One metric name and its children, one per distinct label combination."""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Iterable[str] = (), factory: Callable = None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._factory()
+        return child
+
+    def children(self) -> List[Tuple[Dict[str, str], object]]:
+        return [(dict(zip(self.labelnames, key)), child) for key, child in sorted(self._children.items())]
+
+    # Unlabelled families act as their single child.
+    def __getattr__(self, name: str):
+        if name.startswith("_") or self.labelnames:
+            raise AttributeError(name)
+        return getattr(self.labels(), name)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self._families:
+            raise ValueError(f"Metric {family.name!r} is already registered.")
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily("counter", name, documentation, labelnames, Counter))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily("gauge", name, documentation, labelnames, Gauge))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._register(MetricFamily("histogram", name, documentation, labelnames, lambda: Histogram(buckets)))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for family in self._families.values():
+            exposed_name = family.name + "_total" if family.kind == "counter" else family.name
+            lines.append(f"# HELP {exposed_name} {family.documentation}")
+            lines.append(f"# TYPE {exposed_name} {family.kind}")
+            for labels, child in family.children():
+                if family.kind == "histogram":
+                    for bound, cumulative in child.cumulative():
+                        bucket_labels = dict(labels, le=format_value(bound))
+                        lines.append(f"{family.name}_bucket{format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{family.name}_sum{format_labels(labels)} {format_value(child.sum)}")
+                    lines.append(f"{family.name}_count{format_labels(labels)} {child.count}")
+                else:
+                    lines.append(f"{exposed_name}{format_labels(labels)} {format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> List[str]:
+        """Human-readable digest for the terminal `stats` command."""
+        lines = []
+        for family in self._families.values():
+            for labels, child in family.children():
+                name = family.name + format_labels(labels)
+                if family.kind == "histogram":
+                    if not child.count:
+                        continue
+                    line = (f"{name}: n={child.count} p50={child.quantile(0.5) * 1000:.1f}ms "
+                            f"p95={child.quantile(0.95) * 1000:.1f}ms p99={child.quantile(0.99) * 1000:.1f}ms "
+                            f"max={child.max * 1000:.1f}ms")
+                    slow = child.count_over(ACK_DEADLINE_SECONDS - 0.5)
+                    if slow:
+                        line += f" (>{ACK_DEADLINE_SECONDS - 0.5:g}s: {slow})"
+                    lines.append(line)
+                else:
+                    lines.append(f"{name}: {format_value(child.value)}")
+        return lines
+
+
+REGISTRY = MetricsRegistry()
+
+INTERACTION_SECONDS = REGISTRY.histogram(
+    "timeclock_interaction_seconds", "Time spent inside interaction callbacks.", ("callback",))
+INTERACTION_DELAY_SECONDS = REGISTRY.histogram(
+    "timeclock_interaction_delay_seconds", "Age of an interaction when its callback started running.", ("callback",))
+LOOP_SECONDS = REGISTRY.histogram(
+    "timeclock_loop_seconds", "Duration of background task iterations.", ("loop",))
+STORAGE_SECONDS = REGISTRY.histogram(
+    "timeclock_storage_seconds", "Storage call latency, including time queued for the storage thread.", ("op",))
+STORAGE_BYTES = REGISTRY.gauge(
+    "timeclock_storage_file_bytes", "Size of the files backing the activity store.", ("file",))
+DM_SENDS = REGISTRY.counter(
+    "timeclock_dm_sends", "Direct messages attempted, by final outcome.", ("outcome",))
+DM_RATE_LIMITED = REGISTRY.counter(
+    "timeclock_dm_rate_limited", "429 responses that paused the DM dispatcher.")
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "bot_event_loop_lag_seconds", "How late the event loop woke up a periodic probe.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+GATEWAY_LATENCY_SECONDS = REGISTRY.gauge(
+    "bot_gateway_latency_seconds", "Latency between a gateway HEARTBEAT and its ACK.")
+STARTUP_PHASE_SECONDS = REGISTRY.gauge(
+    "bot_startup_phase_seconds", "Duration of each phase of the last startup.", ("phase",))
+INTERACTIONS_IN_FLIGHT = REGISTRY.gauge(
+    "timeclock_interactions_in_flight", "Interaction callbacks currently running.")
+INTERACTIONS_IN_FLIGHT.set_function(lambda: INTERACTIONS.count)
+CARD_CACHE_LOOKUPS = REGISTRY.counter(
+    "timeclock_card_cache_lookups", "Activity card lookups by result (hit, miss).", ("result",))
+LIVE_PANEL_EDITS = REGISTRY.counter(
+    "timeclock_live_panel_edits", "Edits of live clocked-in panel messages.")
+
+
+def timed(histogram: MetricFamily, **labels):
+    """Decorates a background coroutine function so every call is observed in `histogram` and counted in `BACKGROUND`."""
+    def decorator(func):
+        child = histogram.labels(**labels)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with BACKGROUND.track():
+                    return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def timed_interaction(callback: str):
+    """Like `timed`, for `(self, interaction, ...)` callbacks.
+
+    Also records how old the interaction already was, and counts the call in
+    `INTERACTIONS` so a reload can wait for it.
+    """
+    def decorator(func):
+        duration = INTERACTION_SECONDS.labels(callback=callback)
+        delay = INTERACTION_DELAY_SECONDS.labels(callback=callback)
+
+        @functools.wraps(func)
+        async def wrapper(self, interaction, *args, **kwargs):
+            created_at = getattr(interaction, "created_at", None)
+            if created_at is not None:
+                delay.observe(max(0.0, time.time() - created_at.timestamp()))
+            started = time.perf_counter()
+            try:
+                with INTERACTIONS.track():
+                    return await func(self, interaction, *args, **kwargs)
+            finally:
+                duration.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+async def watch_event_loop(interval: float = 0.5):
+    """Samples event loop lag forever: how much later than requested a sleep actually returns."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+async def start_metrics_server(host: str, port: int, registry: MetricsRegistry = REGISTRY) -> asyncio.AbstractServer:
+    """Serves `registry` at `GET /metrics` over plain HTTP/1.0."""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,93 @@
+import base64
+import functools
+import struct
+from collections import deque
+from typing import Iterable, Iterator, NamedTuple
+
+RECENT_SESSIONS = 5
+TOTAL_TOLERANCE_SECONDS = 1e-3
+
+
+class Session(NamedTuple):
+    start: int
+    end: int
+    duration: float
+
+
+# start and end as int64 epoch seconds, duration as float64; little-endian so saved logs load anywhere.
+SESSION_RECORD = struct.Struct("<qqd")
+# Builds a Session from an unpacked record without going through the Python-level `Session._make`.
+_make_session = functools.partial(tuple.__new__, Session)
+
+
+class SessionLog:
+    """One user's closed sessions, packed as fixed-width 24-byte records in a single buffer.
+
+    Costs 24 bytes per session instead of a tuple and three number objects,
+    and loads from disk with one base64 decode instead of a parse per field.
+    """
+
+    __slots__ = ("_buffer",)
+
+    def __init__(self, data: bytes = b""):
+        if len(data) % SESSION_RECORD.size:
+            raise ValueError("Session log data is not a whole number of records.")
+        self._buffer = bytearray(data)
+
+    @classmethod
+    def from_sessions(cls, sessions: Iterable[Session]) -> "SessionLog":
+        log = cls()
+        for session in sessions:
+            log.append(session)
+        return log
+
+    @classmethod
+    def from_text(cls, text: str) -> "SessionLog":
+        return cls(base64.b64decode(text))
+
+    def to_text(self) -> str:
+        return base64.b64encode(self._buffer).decode("ascii")
+
+    def __len__(self) -> int:
+        return len(self._buffer) // SESSION_RECORD.size
+
+    def __iter__(self) -> Iterator[Session]:
+        # Unpack from a copy: appends resize the buffer, which is not allowed while it is being read.
+        return map(_make_session, SESSION_RECORD.iter_unpack(bytes(self._buffer)))
+
+    def append(self, session: Session):
+        self._buffer += SESSION_RECORD.pack(*session)
+
+    def without_ended(self, since: int, until: int) -> "SessionLog":
+        return SessionLog.from_sessions(session for session in self if not since <= session.end < until)
+
+
+class UserTotals:
+    """Running totals for one user, updated once per closed session."""
+
+    __slots__ = ("total_seconds", "session_count", "recent")
+
+    def __init__(self, total_seconds: float = 0.0, session_count: int = 0, recent: Iterable[Session] = ()):
+        self.total_seconds = total_seconds
+        self.session_count = session_count
+        self.recent = deque(recent, maxlen=RECENT_SESSIONS)
+
+    @classmethod
+    def from_row(cls, row: list) -> "UserTotals":
+        total_seconds, session_count, recent = row
+        return cls(total_seconds, session_count, (Session(*session) for session in recent))
+
+    def to_row(self) -> list:
+        return [self.total_seconds, self.session_count, [list(session) for session in self.recent]]
+
+    def add(self, session: Session):
+        self.total_seconds += session.duration
+        self.session_count += 1
+        self.recent.append(session)
+
+    def matches(self, other: "UserTotals") -> bool:
+        return (
+            self.session_count == other.session_count
+            and abs(self.total_seconds - other.total_seconds) <= TOTAL_TOLERANCE_SECONDS
+            and list(self.recent) == list(other.recent)
+        )
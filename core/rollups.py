@@ -0,0 +1,102 @@
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.models import Session
+
+DAY_SECONDS = 86400
+WINDOW_DAYS = {"daily": 1, "weekly": 7, "monthly": 30}
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def day_of(timestamp: float) -> int:
+    return int(timestamp // DAY_SECONDS)
+
+
+def split_by_day(session: Session) -> List[Tuple[int, float]]:
+    """Splits a session into per-UTC-day portions of its duration.
+
+    Portions are proportional to the wall-clock time spent in each day and
+    always add up to exactly `session.duration`.
+    """
+    first_day, last_day = day_of(session.start), day_of(max(session.end - 1, session.start))
+    if first_day == last_day or session.end <= session.start:
+        return [(first_day, session.duration)]
+    span = session.end - session.start
+    portions = []
+    assigned = 0.0
+    for day in range(first_day, last_day):
+        overlap = min(session.end, (day + 1) * DAY_SECONDS) - max(session.start, day * DAY_SECONDS)
+        seconds = session.duration * overlap / span
+        portions.append((day, seconds))
+        assigned += seconds
+    portions.append((last_day, session.duration - assigned))
+    return portions
+
+
+def window_bounds(window: str, rolling: bool, now: float) -> Optional[Tuple[int, int]]:
+    """Returns the `[first_day, end_day)` range a quota window covers, or None for lifetime."""
+    if window == "lifetime":
+        return None
+    today = day_of(now)
+    end_day = today + 1
+    if rolling:
+        return end_day - WINDOW_DAYS[window], end_day
+    if window == "daily":
+        return today, end_day
+    date = EPOCH + datetime.timedelta(days=today)
+    if window == "weekly":
+        return today - date.weekday(), end_day
+    if window == "monthly":
+        return today - (date.day - 1), end_day
+    raise ValueError(f"Unknown quota window: {window!r}")
+
+
+def window_label(window: str, rolling: bool) -> str:
+    if window == "lifetime":
+        return "all time"
+    if rolling and window != "daily":
+        return f"last {WINDOW_DAYS[window]} days"
+    return {"daily": "today", "weekly": "this week", "monthly": "this month"}[window]
+
+
+class DailyRollups:
+    """Per-user, per-day totals for backends that keep their state in memory."""
+
+    def __init__(self, buckets: Optional[Dict[int, Dict[int, float]]] = None):
+        self._buckets: Dict[int, Dict[int, float]] = buckets or {}
+
+    @classmethod
+    def from_sessions(cls, sessions: Iterable[Tuple[int, Session]]) -> "DailyRollups":
+        rollups = cls()
+        for user_id, session in sessions:
+            rollups.add(user_id, session)
+        return rollups
+
+    @classmethod
+    def from_dict(cls, document: dict) -> "DailyRollups":
+        return cls({
+            int(user_id): {int(day): seconds for day, seconds in days.items()}
+            for user_id, days in document.items()
+        })
+
+    def to_dict(self) -> dict:
+        return self._buckets
+
+    def add(self, user_id: int, session: Session):
+        days = self._buckets.setdefault(user_id, {})
+        for day, seconds in split_by_day(session):
+            days[day] = days.get(day, 0.0) + seconds
+
+    def total(self, user_id: int, first_day: int, end_day: int) -> float:
+        days = self._buckets.get(user_id)
+        if not days:
+            return 0.0
+        return sum(days.get(day, 0.0) for day in range(first_day, end_day))
+
+    def totals(self, first_day: int, end_day: int) -> Dict[int, float]:
+        totals = {}
+        for user_id in self._buckets:
+            total = self.total(user_id, first_day, end_day)
+            if total:
+                totals[user_id] = total
+        return totals
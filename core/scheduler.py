@@ -0,0 +1,98 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class DeadlineScheduler:
+    """Runs `callback(keys)` for every key whose deadline has passed.
+
+    Deadlines live in a min-heap; cancelling or rescheduling a key only
+    invalidates its heap entry, which is dropped lazily when it reaches the
+    top. The runner sleeps exactly until the earliest deadline and is woken
+    early only when a sooner deadline is scheduled.
+    """
+
+    def __init__(self, callback: Callable[[List[Hashable]], Awaitable[None]], clock: Callable[[], float] = time.time):
+        self._callback = callback
+        self._clock = clock
+        self._heap: list = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, deadline: float):
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def snapshot(self) -> Dict[Hashable, float]:
+        return dict(self._deadlines)
+
+    def start(self):
+        self._stopping = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def drain(self):
+        """Stops the runner once any callback already in progress returns; pending deadlines are kept."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        # Shielded so a caller giving up on the wait leaves the task for `stop()` to cancel.
+        await asyncio.shield(self._task)
+        self._task = None
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _discard_stale(self):
+        while self._heap:
+            deadline, _, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: float) -> List[Hashable]:
+        due = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            due.append(key)
+
+    async def _run(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            due = self._pop_due(self._clock())
+            if due:
+                try:
+                    await self._callback(due)
+                except Exception:
+                    logging.exception("Scheduled callback failed.")
+                continue
+
+            timeout = self._heap[0][0] - self._clock() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
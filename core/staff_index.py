@@ -0,0 +1,41 @@
+from typing import Dict, FrozenSet, Iterable, Iterator, Tuple
+
+
+class StaffIndex:
+    """Which members hold which goal roles, kept current from member events.
+
+    Only members holding at least one tracked role are stored, so lookups and
+    iteration scale with the staff team rather than the whole guild.
+    """
+
+    def __init__(self, tracked_role_ids: Iterable[int]):
+        self.tracked_role_ids = frozenset(tracked_role_ids)
+        self._roles: Dict[int, FrozenSet[int]] = {}
+
+    def __len__(self):
+        return len(self._roles)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._roles
+
+    def seed(self, role_members: Dict[int, Iterable[int]]):
+        memberships: Dict[int, set] = {}
+        for role_id, user_ids in role_members.items():
+            if role_id not in self.tracked_role_ids:
+                continue
+            for user_id in user_ids:
+                memberships.setdefault(user_id, set()).add(role_id)
+        self._roles = {user_id: frozenset(role_ids) for user_id, role_ids in memberships.items()}
+
+    def update(self, user_id: int, role_ids: Iterable[int]):
+        tracked = self.tracked_role_ids.intersection(role_ids)
+        if tracked:
+            self._roles[user_id] = tracked
+        else:
+            self._roles.pop(user_id, None)
+
+    def remove(self, user_id: int):
+        self._roles.pop(user_id, None)
+
+    def items(self) -> Iterator[Tuple[int, FrozenSet[int]]]:
+        return iter(list(self._roles.items()))
@@ -0,0 +1,51 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from discord import abc, app_commands
+
+from core.metrics import STARTUP_PHASE_SECONDS
+from core.storage import atomic_write_json
+
+
+def record_phase(name: str, seconds: float):
+    STARTUP_PHASE_SECONDS.labels(phase=name).set(seconds)
+    logging.info(f"Startup phase '{name}': {seconds * 1000:.0f} ms")
+
+
+@contextlib.contextmanager
+def timed_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def command_tree_hash(tree: app_commands.CommandTree, guild: Optional[abc.Snowflake] = None) -> str:
+    """SHA-256 of the payload `tree.sync(guild=guild)` would upload, independent of command registration order."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda data: (data.get("type", 1), data["name"])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_command_hashes(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        logging.warning(f"Ignoring unreadable command hash file '{path}'.")
+        return {}
+
+
+def save_command_hashes(path: str, hashes: Dict[str, str]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    atomic_write_json(path, hashes, indent=2)
@@ -0,0 +1,619 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.archive import ARCHIVE_DIR, SessionArchive, month_start, next_month
+from core.models import Session, SessionLog, UserTotals
+from core.rollups import DailyRollups, split_by_day
+
+SCHEMA_VERSION = 5
+# AFK deadline of checks imported from files that only stored `afk_check_sent: true`. The real
+# deadline was never saved; callers derive it from the session start.
+LEGACY_AFK_DEADLINE = 1
+
+
+def to_timestamp(value: str) -> int:
+    return int(datetime.datetime.fromisoformat(value).timestamp())
+
+
+def to_iso(timestamp: int) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+def legacy_sessions(document: dict) -> Iterator[Tuple[int, Session]]:
+    """Closed sessions of an `activity_data.json` document, in the original ISO-string layout or as packed logs."""
+    for user_id, logs in document.get("time_logs", {}).items():
+        for log in logs:
+            yield int(user_id), Session(to_timestamp(log["start"]), to_timestamp(log["end"]), log["duration_seconds"])
+    for user_id, text in document.get("sessions", {}).items():
+        for session in SessionLog.from_text(text):
+            yield int(user_id), session
+
+
+def atomic_write_json(path: str, document: dict, **dump_kwargs):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(document, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Storage:
+    """Base interface shared by every timeclock storage backend.
+
+    User ids are integers and every timestamp is an epoch second, regardless
+    of how the backend lays them out on disk.
+    """
+
+    def close(self):
+        pass
+
+    def maintain(self):
+        pass
+
+    def file_paths(self) -> List[str]:
+        return [self.path]
+
+    def file_sizes(self) -> Dict[str, int]:
+        sizes = {os.path.basename(path): os.path.getsize(path) for path in self.file_paths() if os.path.exists(path)}
+        sizes[ARCHIVE_DIR] = self.archive.size()
+        return sizes
+
+    @property
+    def archive(self) -> SessionArchive:
+        return SessionArchive(os.path.join(os.path.dirname(self.path), ARCHIVE_DIR))
+
+    def get_open_sessions(self) -> Dict[int, int]:
+        raise NotImplementedError
+
+    def get_open_session(self, user_id: int) -> Optional[int]:
+        raise NotImplementedError
+
+    def clock_in(self, user_id: int, start: int) -> bool:
+        raise NotImplementedError
+
+    def clock_out(self, user_id: int, end: int, reason: str = "clock_out") -> Optional[Session]:
+        raise NotImplementedError
+
+    def iter_sessions(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Tuple[int, Session]]:
+        raise NotImplementedError
+
+    def iter_history(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Tuple[int, Session]]:
+        """Every closed session, archived months first, then the live store."""
+        yield from self.archive.iter_sessions(since, until)
+        yield from self.iter_sessions(since, until)
+
+    def history_totals(self) -> Dict[int, UserTotals]:
+        totals = {}
+        for user_id, session in self.iter_history():
+            totals.setdefault(user_id, UserTotals()).add(session)
+        return totals
+
+    def oldest_session_end(self) -> Optional[int]:
+        return min((session.end for _, session in self.iter_sessions()), default=None)
+
+    def forget_sessions(self, since: int, until: int):
+        """Drops live sessions that ended in `[since, until)` without touching totals or rollups."""
+        raise NotImplementedError
+
+    def archive_sessions(self, before: int) -> int:
+        """Moves the oldest month of live sessions that ended before `before` into the archive.
+
+        `before` should be the start of a month. Returns how many sessions
+        were moved; 0 once nothing older is left.
+        """
+        oldest = self.oldest_session_end()
+        if oldest is None or oldest >= before:
+            return 0
+        month = month_start(oldest)
+        until = min(next_month(month), before)
+        rows = list(self.iter_sessions(month, until))
+        self.archive.add(month, rows)
+        self.forget_sessions(month, until)
+        return len(rows)
+
+    def get_user_totals(self, user_id: int) -> UserTotals:
+        raise NotImplementedError
+
+    def get_total(self, user_id: int) -> float:
+        return self.get_user_totals(user_id).total_seconds
+
+    def verify_totals(self) -> List[int]:
+        return [
+            user_id for user_id, totals in sorted(self.history_totals().items())
+            if not self.get_user_totals(user_id).matches(totals)
+        ]
+
+    def rebuild_totals(self):
+        """Recomputes every derived aggregate (totals and daily rollups) from the session history."""
+        raise NotImplementedError
+
+    def get_all_totals(self) -> Dict[int, float]:
+        raise NotImplementedError
+
+    def get_window_total(self, user_id: int, first_day: int, end_day: int) -> float:
+        raise NotImplementedError
+
+    def get_window_totals(self, first_day: int, end_day: int) -> Dict[int, float]:
+        raise NotImplementedError
+
+    def get_quota_notifications(self) -> Dict[int, int]:
+        raise NotImplementedError
+
+    def set_quota_notifications(self, notified: Dict[int, int]):
+        raise NotImplementedError
+
+    def get_afk_checks(self) -> Dict[int, int]:
+        """Maps each user with an AFK check this session to its response deadline (0 once answered, `LEGACY_AFK_DEADLINE` if unknown)."""
+        raise NotImplementedError
+
+    def mark_afk_checks(self, deadlines: Dict[int, int]):
+        raise NotImplementedError
+
+    def resolve_afk_check(self, user_id: int):
+        raise NotImplementedError
+
+    def get_settings(self) -> Dict[str, object]:
+        raise NotImplementedError
+
+    def set_setting(self, key: str, value):
+        """Stores a JSON-serializable value; `None` removes the key."""
+        raise NotImplementedError
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._upgrade()
+
+    def _upgrade(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            with self._conn:
+                getattr(self, f"_migrate_{target}")()
+                self._conn.execute(f"PRAGMA user_version = {target}")
+
+    def _migrate_1(self):
+        self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS open_sessions (
+                    user_id INTEGER PRIMARY KEY,
+                    start_ts INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    start_ts INTEGER NOT NULL,
+                    end_ts INTEGER NOT NULL,
+                    duration REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, end_ts);
+                CREATE INDEX IF NOT EXISTS idx_sessions_end ON sessions (end_ts);
+                CREATE TABLE IF NOT EXISTS notifications (
+                    user_id INTEGER PRIMARY KEY,
+                    last_quota_ts INTEGER,
+                    afk_check_ts INTEGER
+                );
+            """)
+
+    def _migrate_2(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_totals (
+                user_id INTEGER PRIMARY KEY,
+                total_seconds REAL NOT NULL,
+                session_count INTEGER NOT NULL,
+                recent TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_user_totals_total ON user_totals (total_seconds)")
+        self._rebuild_totals()
+
+    def _migrate_3(self):
+        # Pending checks from before this version stored the send time; using it as
+        # the deadline just expires those (already orphaned) prompts on startup.
+        self._conn.execute("ALTER TABLE notifications RENAME COLUMN afk_check_ts TO afk_deadline_ts")
+
+    def _migrate_4(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_rollups (
+                user_id INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                PRIMARY KEY (user_id, day)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_rollups_day ON daily_rollups (day)")
+        self._rebuild_rollups()
+
+    def _migrate_5(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    def file_paths(self) -> List[str]:
+        return [self.path, self.path + "-wal"]
+
+    def is_empty(self) -> bool:
+        row = self._conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM sessions) OR EXISTS(SELECT 1 FROM open_sessions)"
+        ).fetchone()
+        return not row[0]
+
+    def get_open_sessions(self) -> Dict[int, int]:
+        return dict(self._conn.execute("SELECT user_id, start_ts FROM open_sessions"))
+
+    def get_open_session(self, user_id: int) -> Optional[int]:
+        row = self._conn.execute("SELECT start_ts FROM open_sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def clock_in(self, user_id: int, start: int) -> bool:
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO open_sessions (user_id, start_ts) VALUES (?, ?)", (user_id, start)
+            )
+        return cursor.rowcount == 1
+
+    def clock_out(self, user_id: int, end: int, reason: str = "clock_out") -> Optional[Session]:
+        with self._conn:
+            row = self._conn.execute("SELECT start_ts FROM open_sessions WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return None
+            session = Session(row[0], end, float(end - row[0]))
+            self._conn.execute("DELETE FROM open_sessions WHERE user_id = ?", (user_id,))
+            self._conn.execute(
+                "INSERT INTO sessions (user_id, start_ts, end_ts, duration) VALUES (?, ?, ?, ?)",
+                (user_id, session.start, session.end, session.duration)
+            )
+            totals = self.get_user_totals(user_id)
+            totals.add(session)
+            self._save_totals(user_id, totals)
+            self._add_rollups(user_id, session)
+            self._conn.execute("UPDATE notifications SET afk_deadline_ts = NULL WHERE user_id = ?", (user_id,))
+        return session
+
+    def _save_totals(self, user_id: int, totals: UserTotals):
+        total_seconds, session_count, recent = totals.to_row()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO user_totals (user_id, total_seconds, session_count, recent) VALUES (?, ?, ?, ?)",
+            (user_id, total_seconds, session_count, json.dumps(recent, separators=(",", ":")))
+        )
+
+    def _rebuild_totals(self):
+        self._conn.execute("DELETE FROM user_totals")
+        for user_id, totals in self.history_totals().items():
+            self._save_totals(user_id, totals)
+
+    def _add_rollups(self, user_id: int, session: Session):
+        self._conn.executemany(
+            "INSERT INTO daily_rollups (user_id, day, seconds) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, day) DO UPDATE SET seconds = seconds + excluded.seconds",
+            ((user_id, day, seconds) for day, seconds in split_by_day(session))
+        )
+
+    def _rebuild_rollups(self):
+        self._conn.execute("DELETE FROM daily_rollups")
+        for user_id, session in self.iter_history():
+            self._add_rollups(user_id, session)
+
+    def rebuild_totals(self):
+        with self._conn:
+            self._rebuild_totals()
+            self._rebuild_rollups()
+
+    def iter_sessions(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Tuple[int, Session]]:
+        query = "SELECT user_id, start_ts, end_ts, duration FROM sessions"
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("end_ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("end_ts < ?")
+            params.append(until)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        for user_id, start, end, duration in self._conn.execute(query + " ORDER BY end_ts, id", params):
+            yield user_id, Session(start, end, duration)
+
+    def oldest_session_end(self) -> Optional[int]:
+        return self._conn.execute("SELECT MIN(end_ts) FROM sessions").fetchone()[0]
+
+    def forget_sessions(self, since: int, until: int):
+        with self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE end_ts >= ? AND end_ts < ?", (since, until))
+
+    def get_user_totals(self, user_id: int) -> UserTotals:
+        row = self._conn.execute(
+            "SELECT total_seconds, session_count, recent FROM user_totals WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return UserTotals()
+        return UserTotals.from_row([row[0], row[1], json.loads(row[2])])
+
+    def get_total(self, user_id: int) -> float:
+        row = self._conn.execute("SELECT total_seconds FROM user_totals WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0.0
+
+    def get_all_totals(self) -> Dict[int, float]:
+        return dict(self._conn.execute("SELECT user_id, total_seconds FROM user_totals"))
+
+    def get_window_total(self, user_id: int, first_day: int, end_day: int) -> float:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(seconds), 0) FROM daily_rollups WHERE user_id = ? AND day >= ? AND day < ?",
+            (user_id, first_day, end_day)
+        ).fetchone()
+        return row[0]
+
+    def get_window_totals(self, first_day: int, end_day: int) -> Dict[int, float]:
+        return dict(self._conn.execute(
+            "SELECT user_id, SUM(seconds) FROM daily_rollups WHERE day >= ? AND day < ? GROUP BY user_id",
+            (first_day, end_day)
+        ))
+
+    def get_quota_notifications(self) -> Dict[int, int]:
+        return dict(self._conn.execute(
+            "SELECT user_id, last_quota_ts FROM notifications WHERE last_quota_ts IS NOT NULL"
+        ))
+
+    def set_quota_notifications(self, notified: Dict[int, int]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO notifications (user_id, last_quota_ts) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET last_quota_ts = excluded.last_quota_ts",
+                notified.items()
+            )
+
+    def get_afk_checks(self) -> Dict[int, int]:
+        return dict(self._conn.execute(
+            "SELECT user_id, afk_deadline_ts FROM notifications WHERE afk_deadline_ts IS NOT NULL"
+        ))
+
+    def mark_afk_checks(self, deadlines: Dict[int, int]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO notifications (user_id, afk_deadline_ts) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET afk_deadline_ts = excluded.afk_deadline_ts",
+                deadlines.items()
+            )
+
+    def resolve_afk_check(self, user_id: int):
+        with self._conn:
+            self._conn.execute("UPDATE notifications SET afk_deadline_ts = 0 WHERE user_id = ?", (user_id,))
+
+    def get_settings(self) -> Dict[str, object]:
+        return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM settings")}
+
+    def set_setting(self, key: str, value):
+        with self._conn:
+            if value is None:
+                self._conn.execute("DELETE FROM settings WHERE key = ?", (key,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value, separators=(",", ":")))
+                )
+
+    def import_legacy(self, document: dict):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO open_sessions (user_id, start_ts) VALUES (?, ?)",
+                ((int(user_id), to_timestamp(start)) for user_id, start in document.get("currently_clocked_in", {}).items())
+            )
+            self._conn.executemany(
+                "INSERT INTO sessions (user_id, start_ts, end_ts, duration) VALUES (?, ?, ?, ?)",
+                ((user_id, *session) for user_id, session in legacy_sessions(document))
+            )
+            self._conn.executemany(
+                "INSERT INTO notifications (user_id, last_quota_ts) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET last_quota_ts = excluded.last_quota_ts",
+                ((int(user_id), to_timestamp(ts)) for user_id, ts in document.get("last_quota_notification", {}).items())
+            )
+            self._conn.executemany(
+                "INSERT INTO notifications (user_id, afk_deadline_ts) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET afk_deadline_ts = excluded.afk_deadline_ts",
+                ((int(user_id), LEGACY_AFK_DEADLINE) for user_id, sent in document.get("afk_check_sent", {}).items() if sent)
+            )
+            self._rebuild_totals()
+            self._rebuild_rollups()
+
+
+class JSONStorage(Storage):
+    """Legacy single-document backend, kept for installs that still want `activity_data.json`.
+
+    Closed sessions are kept as one packed `SessionLog` per user and saved
+    base64-encoded under `sessions`; files still using the original
+    `time_logs` layout are converted on load, after copying them to
+    `<path>.bak`. Totals and rollups are rebuilt on every load, so the
+    document also keeps those of archived sessions (`archived_totals`,
+    `archived_rollups`); a normal load never has to read the archive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        exists = os.path.exists(path)
+        if exists:
+            with open(path, "r") as f:
+                self._data = json.load(f)
+        else:
+            self._data = {}
+        convert = "time_logs" in self._data
+        if convert and not os.path.exists(path + ".bak"):
+            shutil.copy2(path, path + ".bak")
+            logging.info(f"Converting '{path}' to packed sessions; the original was kept as '{path}.bak'.")
+        for key in ("currently_clocked_in", "last_quota_notification", "afk_check_sent", "settings",
+                    "archived_totals", "archived_rollups"):
+            self._data.setdefault(key, {})
+        self._logs: Dict[int, SessionLog] = {}
+        for user_id, session in legacy_sessions(self._data):
+            self._logs.setdefault(user_id, SessionLog()).append(session)
+        self._data.pop("time_logs", None)
+        self._data.pop("sessions", None)
+        if convert or not exists:
+            self._save()
+        self._load_totals()
+
+    def _save(self):
+        document = dict(self._data, sessions={str(user_id): log.to_text() for user_id, log in self._logs.items()})
+        atomic_write_json(self.path, document, separators=(",", ":"))
+
+    def get_open_sessions(self) -> Dict[int, int]:
+        return {int(user_id): to_timestamp(start) for user_id, start in self._data["currently_clocked_in"].items()}
+
+    def get_open_session(self, user_id: int) -> Optional[int]:
+        start = self._data["currently_clocked_in"].get(str(user_id))
+        return to_timestamp(start) if start else None
+
+    def clock_in(self, user_id: int, start: int) -> bool:
+        if str(user_id) in self._data["currently_clocked_in"]:
+            return False
+        self._data["currently_clocked_in"][str(user_id)] = to_iso(start)
+        self._save()
+        return True
+
+    def clock_out(self, user_id: int, end: int, reason: str = "clock_out") -> Optional[Session]:
+        start_iso = self._data["currently_clocked_in"].pop(str(user_id), None)
+        if start_iso is None:
+            return None
+        start = to_timestamp(start_iso)
+        session = Session(start, end, float(end - start))
+        self._logs.setdefault(user_id, SessionLog()).append(session)
+        self._totals.setdefault(user_id, UserTotals()).add(session)
+        self._rollups.add(user_id, session)
+        self._data["afk_check_sent"].pop(str(user_id), None)
+        self._save()
+        return session
+
+    def iter_sessions(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Tuple[int, Session]]:
+        for user_id, log in list(self._logs.items()):
+            for session in log:
+                if since is not None and session.end < since:
+                    continue
+                if until is not None and session.end >= until:
+                    continue
+                yield user_id, session
+
+    def get_user_totals(self, user_id: int) -> UserTotals:
+        return self._totals.get(user_id) or UserTotals()
+
+    def _archived_aggregates(self) -> Tuple[Dict[int, UserTotals], DailyRollups]:
+        totals = {int(user_id): UserTotals.from_row(row) for user_id, row in self._data["archived_totals"].items()}
+        return totals, DailyRollups.from_dict(self._data["archived_rollups"])
+
+    def _set_archived_aggregates(self, totals: Dict[int, UserTotals], rollups: DailyRollups):
+        self._data["archived_totals"] = {str(user_id): user_totals.to_row() for user_id, user_totals in totals.items()}
+        self._data["archived_rollups"] = rollups.to_dict()
+
+    def _load_totals(self):
+        self._totals, self._rollups = self._archived_aggregates()
+        for user_id, session in self.iter_sessions():
+            self._totals.setdefault(user_id, UserTotals()).add(session)
+            self._rollups.add(user_id, session)
+
+    def rebuild_totals(self):
+        totals, rollups = {}, DailyRollups()
+        for user_id, session in self.archive.iter_sessions():
+            totals.setdefault(user_id, UserTotals()).add(session)
+            rollups.add(user_id, session)
+        self._set_archived_aggregates(totals, rollups)
+        self._save()
+        self._load_totals()
+
+    def forget_sessions(self, since: int, until: int):
+        totals, rollups = self._archived_aggregates()
+        for user_id, log in list(self._logs.items()):
+            for session in log:
+                if since <= session.end < until:
+                    totals.setdefault(user_id, UserTotals()).add(session)
+                    rollups.add(user_id, session)
+            kept = log.without_ended(since, until)
+            if kept:
+                self._logs[user_id] = kept
+            else:
+                del self._logs[user_id]
+        self._set_archived_aggregates(totals, rollups)
+        self._save()
+
+    def get_window_total(self, user_id: int, first_day: int, end_day: int) -> float:
+        return self._rollups.total(user_id, first_day, end_day)
+
+    def get_window_totals(self, first_day: int, end_day: int) -> Dict[int, float]:
+        return self._rollups.totals(first_day, end_day)
+
+    def get_all_totals(self) -> Dict[int, float]:
+        return {user_id: totals.total_seconds for user_id, totals in self._totals.items()}
+
+    def get_quota_notifications(self) -> Dict[int, int]:
+        return {int(user_id): to_timestamp(ts) for user_id, ts in self._data["last_quota_notification"].items()}
+
+    def set_quota_notifications(self, notified: Dict[int, int]):
+        for user_id, ts in notified.items():
+            self._data["last_quota_notification"][str(user_id)] = to_iso(ts)
+        self._save()
+
+    def get_afk_checks(self) -> Dict[int, int]:
+        # Older files only stored `true`.
+        return {
+            int(user_id): LEGACY_AFK_DEADLINE if sent is True else int(sent)
+            for user_id, sent in self._data["afk_check_sent"].items()
+            if sent is not False
+        }
+
+    def mark_afk_checks(self, deadlines: Dict[int, int]):
+        for user_id, deadline in deadlines.items():
+            self._data["afk_check_sent"][str(user_id)] = deadline
+        self._save()
+
+    def resolve_afk_check(self, user_id: int):
+        if str(user_id) in self._data["afk_check_sent"]:
+            self._data["afk_check_sent"][str(user_id)] = 0
+            self._save()
+
+    def get_settings(self) -> Dict[str, object]:
+        return dict(self._data["settings"])
+
+    def set_setting(self, key: str, value):
+        if value is None:
+            self._data["settings"].pop(key, None)
+        else:
+            self._data["settings"][key] = value
+        self._save()
+
+
+def migrate_json(json_path: str, storage: Storage) -> bool:
+    if not os.path.exists(json_path) or not storage.is_empty():
+        return False
+    with open(json_path, "r") as f:
+        document = json.load(f)
+    storage.import_legacy(document)
+    os.replace(json_path, json_path + ".migrated")
+    logging.info(f"Migrated legacy activity data from '{json_path}' into '{storage.path}'.")
+    return True
+
+
+def open_storage(backend: str, path: str, legacy_json_path: Optional[str] = None) -> Storage:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if backend == "json":
+        return JSONStorage(path)
+    if backend == "sqlite":
+        storage = SQLiteStorage(path)
+    elif backend == "journal":
+        from core.journal import JournalStorage
+        storage = JournalStorage(path)
+    else:
+        raise ValueError(f"Unknown storage backend: {backend!r}")
+    if legacy_json_path:
+        migrate_json(legacy_json_path, storage)
+    return storage